@@ -0,0 +1,330 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains a tournament runner for comparing Go players. Players are registered by name
+with a function creating them, and are then played against each other in matches with alternating
+colours, either all against all (round robin) or one challenger against all the others (gauntlet).
+
+The results are turned into Elo ratings with 95% confidence intervals. A match can also be stopped
+early with a sequential probability ratio test (SPRT): once the games played show, with the chosen
+error rates, that the Elo difference is either at most elo0 or at least elo1, the remaining games
+of the match would not change the conclusion and are not played.
+
+Games are played without a display (see the selfplay module).
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+import math
+from functools import partial
+from typing import Callable, Optional
+from go_player import GoPlayer, FullyRandom, MCTSPlayer
+from selfplay import play_game, DEFAULT_MAX_MOVES
+
+# the number of standard deviations on either side of an estimate in its 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+# the players which can be used in a tournament, by name, with a function creating a new player
+PLAYERS: dict[str, Callable[[], GoPlayer]] = {
+    'random': partial(FullyRandom, None),
+    'mcts-100': partial(MCTSPlayer, playouts=100),
+    'mcts-400': partial(MCTSPlayer, playouts=400),
+}
+
+
+def register_player(name: str, create_player: Callable[[], GoPlayer]) -> None:
+    """Register a player configuration under the given name, replacing any configuration with the same name
+
+    create_player is called with no arguments to create the player for each match, e.g.
+    partial(MCTSPlayer, tree, playouts=1000) or lambda: ProbabilityBaseGoplayer(load_tree_from_file(...)).
+    """
+    PLAYERS[name] = create_player
+
+
+def expected_score(elo_difference: float) -> float:
+    """Return the expected score of a player rated elo_difference points above its opponent
+
+    >>> expected_score(0.0)
+    0.5
+    >>> round(expected_score(400.0), 3)
+    0.909
+    """
+    return 1 / (1 + 10 ** (-elo_difference / 400))
+
+
+def elo_from_score(score: float) -> float:
+    """Return the Elo difference giving the expected score, which is infinite for a score of 0 or 1
+
+    >>> elo_from_score(0.5)
+    0.0
+    >>> round(elo_from_score(0.75), 1)
+    190.8
+    """
+    if score <= 0.0:
+        return -math.inf
+    elif score >= 1.0:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_difference(wins: int, losses: int, draws: int = 0) -> tuple[float, float, float]:
+    """Return the estimated Elo difference of a player with the given results against one opponent,
+    and the lower and upper bounds of its 95% confidence interval
+
+    >>> estimate, low, high = elo_difference(30, 10)
+    >>> round(estimate, 1), round(low, 1), round(high, 1)
+    (190.8, 82.0, 353.1)
+
+    Preconditions:
+        - wins + losses + draws > 0
+    """
+    games = wins + losses + draws
+    score = (wins + draws / 2) / games
+    # the standard deviation of the mean score of a game, counting a draw as half a win
+    deviation = math.sqrt(max(wins * (1 - score) ** 2 + losses * score ** 2 + draws * (0.5 - score) ** 2, 0.0)
+                          / games / games)
+    return (elo_from_score(score), elo_from_score(score - CONFIDENCE_Z * deviation),
+            elo_from_score(score + CONFIDENCE_Z * deviation))
+
+
+class SPRT:
+    """A sequential probability ratio test between the hypotheses that the Elo difference of a player
+    over its opponent is elo0 (H0) or elo1 (H1)
+
+    Draws are not counted, as they do not say which hypothesis is more likely.
+
+    >>> test = SPRT(0.0, 50.0)
+    >>> test.decision(10, 10) is None
+    True
+    >>> test.decision(150, 90)
+    'H1'
+    >>> test.decision(100, 140)
+    'H0'
+
+    Instance Attributes:
+        - elo0: the Elo difference of the null hypothesis
+        - elo1: the Elo difference of the alternative hypothesis
+        - alpha: the probability of accepting H1 when H0 is true
+        - beta: the probability of accepting H0 when H1 is true
+
+    Representation Invariants:
+        - self.elo0 < self.elo1
+        - 0 < self.alpha < 1
+        - 0 < self.beta < 1
+    """
+    elo0: float
+    elo1: float
+    alpha: float
+    beta: float
+
+    def __init__(self, elo0: float = 0.0, elo1: float = 30.0, alpha: float = 0.05, beta: float = 0.05) -> None:
+        """Initialize a test between the Elo differences elo0 and elo1 with the given error rates"""
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+
+    def log_likelihood_ratio(self, wins: int, losses: int) -> float:
+        """Return the logarithm of how much more likely the given results are under H1 than under H0"""
+        p0, p1 = expected_score(self.elo0), expected_score(self.elo1)
+        return wins * math.log(p1 / p0) + losses * math.log((1 - p1) / (1 - p0))
+
+    def decision(self, wins: int, losses: int) -> Optional[str]:
+        """Return 'H1' if the given results accept H1, 'H0' if they accept H0, or None if more games are needed"""
+        ratio = self.log_likelihood_ratio(wins, losses)
+        if ratio >= math.log((1 - self.beta) / self.alpha):
+            return 'H1'
+        elif ratio <= math.log(self.beta / (1 - self.alpha)):
+            return 'H0'
+        return None
+
+
+class MatchResult:
+    """The results of a match between two registered players
+
+    Instance Attributes:
+        - player: the name of the first player
+        - opponent: the name of the second player
+        - wins: the number of games won by player
+        - losses: the number of games won by opponent
+        - draws: the number of drawn games
+        - decision: the decision of the SPRT of the match which stopped it, or None if it was not stopped early
+
+    Representation Invariants:
+        - self.wins >= 0 and self.losses >= 0 and self.draws >= 0
+        - self.decision in {None, 'H0', 'H1'}
+    """
+    player: str
+    opponent: str
+    wins: int
+    losses: int
+    draws: int
+    decision: Optional[str]
+
+    def __init__(self, player: str, opponent: str) -> None:
+        """Initialize the results of a match which has not started"""
+        self.player = player
+        self.opponent = opponent
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.decision = None
+
+    def games(self) -> int:
+        """Return the number of games played in the match"""
+        return self.wins + self.losses + self.draws
+
+    def __str__(self) -> str:
+        """Return a one line summary of the match"""
+        summary = f'{self.player} vs {self.opponent}: +{self.wins} -{self.losses} ={self.draws}'
+        if self.games() > 0:
+            estimate, low, high = elo_difference(self.wins, self.losses, self.draws)
+            summary += f', Elo {estimate:+.0f} [{low:+.0f}, {high:+.0f}]'
+        if self.decision is not None:
+            summary += f', SPRT accepted {self.decision}'
+        return summary
+
+
+def play_match(player: str, opponent: str, games: int, sprt: Optional[SPRT] = None,
+               max_moves: int = DEFAULT_MAX_MOVES, board_size: int = 9) -> MatchResult:
+    """Play a match of the given number of games between the two registered players, who take turns playing
+    black, and return its results. The match stops early if the given SPRT (about the Elo difference of player
+    over opponent) reaches a decision.
+
+    Preconditions:
+        - player in PLAYERS and opponent in PLAYERS
+        - games >= 0
+    """
+    result = MatchResult(player, opponent)
+    first, second = PLAYERS[player](), PLAYERS[opponent]()
+    try:
+        for i in range(games):
+            if i % 2 == 0:
+                game = play_game(first, second, max_moves, board_size)
+                first_color = "Black"
+            else:
+                game = play_game(second, first, max_moves, board_size)
+                first_color = "White"
+            white_score, black_score = game.overall_score()
+            if white_score == black_score:
+                result.draws += 1
+            elif game.iswinner(first_color):
+                result.wins += 1
+            else:
+                result.losses += 1
+
+            if sprt is not None:
+                result.decision = sprt.decision(result.wins, result.losses)
+                if result.decision is not None:
+                    break
+    finally:
+        first.close()
+        second.close()
+    return result
+
+
+def round_robin(players: list[str], games: int, sprt: Optional[SPRT] = None, max_moves: int = DEFAULT_MAX_MOVES,
+                board_size: int = 9, verbose: bool = True) -> list[MatchResult]:
+    """Play a match of the given number of games between every two of the given registered players,
+    and return the results of the matches. If verbose is True, every result is printed when its match ends.
+
+    Preconditions:
+        - all(player in PLAYERS for player in players)
+        - games >= 0
+    """
+    results = []
+    for i in range(len(players)):
+        for opponent in players[i + 1:]:
+            results.append(play_match(players[i], opponent, games, sprt, max_moves, board_size))
+            if verbose:
+                print(results[-1])
+    return results
+
+
+def gauntlet(challenger: str, opponents: list[str], games: int, sprt: Optional[SPRT] = None,
+             max_moves: int = DEFAULT_MAX_MOVES, board_size: int = 9, verbose: bool = True) -> list[MatchResult]:
+    """Play a match of the given number of games between the challenger and each of the given opponents (all of them
+    registered players), and return the results of the matches. If verbose is True, every result is printed when
+    its match ends.
+
+    Preconditions:
+        - challenger in PLAYERS
+        - all(opponent in PLAYERS for opponent in opponents)
+        - games >= 0
+    """
+    results = []
+    for opponent in opponents:
+        results.append(play_match(challenger, opponent, games, sprt, max_moves, board_size))
+        if verbose:
+            print(results[-1])
+    return results
+
+
+def ratings(results: list[MatchResult], iterations: int = 1000) -> dict[str, tuple[float, float]]:
+    """Return the Elo rating of every player of the given matches, and the half-width of its 95% confidence
+    interval, fitted to all the results at once (a Bradley-Terry model). The ratings average to 0.
+
+    Each pair of opponents is given one extra virtual draw, so that a player who won or lost every game
+    still gets a finite rating.
+
+    >>> example = MatchResult('a', 'b')
+    >>> example.wins, example.losses = 30, 10
+    >>> fitted = ratings([example])
+    >>> round(fitted['a'][0] - fitted['b'][0])
+    185
+    """
+    scores = {}
+    games = {}
+    for result in results:
+        for player in (result.player, result.opponent):
+            scores.setdefault(player, 0.0)
+            games.setdefault(player, {})
+        played = result.games() + 1
+        scores[result.player] += result.wins + (result.draws + 1) / 2
+        scores[result.opponent] += result.losses + (result.draws + 1) / 2
+        games[result.player][result.opponent] = games[result.player].get(result.opponent, 0) + played
+        games[result.opponent][result.player] = games[result.opponent].get(result.player, 0) + played
+
+    # strengths are 10 ** (rating / 400), fitted with the minorization-maximization algorithm
+    strengths = {player: 1.0 for player in scores}
+    for _ in range(iterations):
+        for player in strengths:
+            denominator = sum(count / (strengths[player] + strengths[opponent])
+                              for opponent, count in games[player].items())
+            strengths[player] = scores[player] / denominator
+        mean_log = sum(math.log(strength) for strength in strengths.values()) / len(strengths)
+        strengths = {player: strength / math.exp(mean_log) for player, strength in strengths.items()}
+
+    fitted = {}
+    for player, strength in strengths.items():
+        information = sum(count * strength * strengths[opponent] / (strength + strengths[opponent]) ** 2
+                          for opponent, count in games[player].items())
+        rating = 400 * math.log10(strength)
+        fitted[player] = (rating, CONFIDENCE_Z * 400 / math.log(10) / math.sqrt(information))
+    return fitted
+
+
+def print_ratings(results: list[MatchResult]) -> None:
+    """Print the table of the ratings of the players of the given matches, from the highest rating"""
+    fitted = ratings(results)
+    for player, (rating, margin) in sorted(fitted.items(), key=lambda item: -item[1][0]):
+        print(f'{player:>20} {rating:+7.0f} +/- {margin:.0f}')
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # print_ratings(round_robin(['random', 'mcts-100', 'mcts-400'], 20, SPRT(0, 50)))
@@ -0,0 +1,213 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains functions for scoring many finished boards at once with NumPy, giving the
+same territory and scores as Board.calculate_score and Game.overall_score.
+
+A stack of boards is an integer array of shape (batch, size, size), where stack[i, x, y] is 0 for an
+empty point, 1 for a black stone and 2 for a white stone. The empty regions of every board of the
+stack are labelled together by repeatedly spreading the smallest point index through each region,
+and the stones bordering each region are then counted by colour with a single bincount.
+
+NumPy is optional: without it, score_records and score_games score the boards one at a time in
+python, and the functions working on stacks raise ImportError.
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+from typing import Any
+from board import Board, point_neighbours
+from game import Game, KOMI
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+COLOR_CODES = {"Neither": 0, "Black": 1, "White": 2}
+# the colour code given to the points outside of the board
+_OFF_BOARD = 3
+
+
+def encode_board(board: Any) -> bytes:
+    """Return the colours of the given Board or BitBoard as one byte per point (see COLOR_CODES), in the
+    order of the point indices x * size + y. This is a compact record of a finished board, which can be sent
+    between processes and stacked with np.frombuffer.
+
+    >>> board = Board(9)
+    >>> board.add_stone(0, 1, "White")
+    >>> encode_board(board)[:3]
+    b'\\x00\\x02\\x00'
+    """
+    size = board.size
+    return bytes(COLOR_CODES[board.get_color(x, y)] for x in range(size) for y in range(size))
+
+
+def boards_to_array(boards: list) -> np.ndarray:
+    """Return the stack of the given boards (Board or BitBoard objects, all of the same size)
+
+    Preconditions:
+        - boards != []
+        - all(board.size == boards[0].size for board in boards)
+    """
+    _require_numpy()
+    size = boards[0].size
+    data = b''.join(encode_board(board) for board in boards)
+    return np.frombuffer(data, dtype=np.int8).reshape(len(boards), size, size)
+
+
+def batch_territory(stack: np.ndarray, technique: str = "dfs") -> tuple[np.ndarray, np.ndarray]:
+    """Return boolean arrays of the shape of the given stack of boards, marking the points owned by black
+    and by white on every board, as Board.calculate_score does with the given technique
+
+    Preconditions:
+        - stack.ndim == 3 and stack.shape[1] == stack.shape[2]
+        - stack only contains 0, 1 and 2
+    """
+    _require_numpy()
+    batch, size = stack.shape[0], stack.shape[1]
+    points = size * size
+    colors = stack.reshape(batch, points).astype(np.int8)
+    # the neighbours of every point, with points outside the board mapped to an extra column
+    neighbours = np.array([list(point) + [points] * (4 - len(point)) for point in point_neighbours(size)])
+    rows = np.arange(batch)[:, None, None]
+
+    empty = colors == 0
+    padded_colors = np.concatenate([colors, np.full((batch, 1), _OFF_BOARD, dtype=np.int8)], axis=1)
+    neighbour_colors = padded_colors[:, neighbours]
+
+    # label every empty region with the smallest index of its points; stones and off-board points get points.
+    # The labels are kept in a buffer with an extra column for the off-board points.
+    padded_labels = np.full((batch, points + 1), points, dtype=np.int16)
+    padded_labels[:, :points] = np.where(empty, np.arange(points), points)
+    labels = padded_labels[:, :points]
+    jumps = np.full((batch, points + 1), points, dtype=np.int16)
+    while True:
+        spread = np.where(empty, np.minimum(labels, padded_labels[:, neighbours].min(axis=2)), points)
+        # a label is the index of a point of the same region, so jumping to the label of that point
+        # spreads the smallest index through long regions in far fewer steps
+        jumps[:, :points] = spread
+        spread = np.take_along_axis(jumps, spread, axis=1)
+        if np.array_equal(spread, labels):
+            break
+        labels[:] = spread
+    neighbour_labels = padded_labels[:, neighbours].astype(np.int64)
+    neighbour_is_empty = neighbour_colors == 0
+    # the index of the region of every empty neighbour in the whole stack (0 where the neighbour is not empty)
+    neighbour_regions = np.where(neighbour_is_empty, rows * points + neighbour_labels, 0)
+
+    # count the distinct stones of each colour bordering every region: a stone bordering the same region on
+    # several sides is only counted for the first of those sides
+    first_side = neighbour_is_empty & (~empty)[:, :, None]
+    for side in range(1, 4):
+        for earlier in range(side):
+            first_side[:, :, side] &= ~(neighbour_is_empty[:, :, earlier]
+                                        & (neighbour_regions[:, :, earlier] == neighbour_regions[:, :, side]))
+    regions = neighbour_regions[first_side]
+    stone_colors = np.broadcast_to(colors[:, :, None], first_side.shape)[first_side]
+    black_border = np.bincount(regions, weights=stone_colors == 1, minlength=batch * points)
+    white_border = np.bincount(regions, weights=stone_colors == 2, minlength=batch * points)
+
+    own_regions = np.where(empty, np.arange(batch)[:, None] * points + labels, 0)
+    black_owned = empty & (black_border[own_regions] > 0) & (white_border[own_regions] == 0)
+    white_owned = empty & (white_border[own_regions] > 0) & (black_border[own_regions] == 0)
+
+    if technique == "flood_fill":
+        # flood fill counts every stone as its own colour's
+        black_owned |= colors == 1
+        white_owned |= colors == 2
+    else:
+        # dfs gives a stone the colours next to it, and those around its neighbouring regions except itself
+        is_black, is_white = (colors == 1)[:, :, None], (colors == 2)[:, :, None]
+        sees_black = ((neighbour_colors == 1)
+                      | (neighbour_is_empty & (black_border[neighbour_regions] - is_black > 0))).any(axis=2)
+        sees_white = ((neighbour_colors == 2)
+                      | (neighbour_is_empty & (white_border[neighbour_regions] - is_white > 0))).any(axis=2)
+        stones_owned = ~empty
+        black_owned |= stones_owned & sees_black & ~sees_white
+        white_owned |= stones_owned & sees_white & ~sees_black
+
+    return black_owned.reshape(batch, size, size), white_owned.reshape(batch, size, size)
+
+
+def batch_scores(stack: np.ndarray, black_captured: np.ndarray, white_captured: np.ndarray,
+                 technique: str = "dfs") -> tuple[np.ndarray, np.ndarray]:
+    """Return the overall scores of white and of black for every board of the given stack, where the
+    players captured the given numbers of stones, as Game.overall_score does
+
+    Preconditions:
+        - stack.ndim == 3 and stack.shape[1] == stack.shape[2]
+        - len(black_captured) == len(white_captured) == stack.shape[0]
+    """
+    black_owned, white_owned = batch_territory(stack, technique)
+    white_scores = KOMI + white_owned.sum(axis=(1, 2)) + np.asarray(white_captured)
+    black_scores = black_owned.sum(axis=(1, 2)) + np.asarray(black_captured)
+    return white_scores, black_scores
+
+
+def game_record(game: Game) -> tuple[int, bytes, int, int]:
+    """Return the (board size, encoded board, black captured, white captured) record of the given game, which
+    is all that is needed to score it"""
+    return game.board.size, encode_board(game.board), game.black_captured, game.white_captured
+
+
+def score_records(records: list[tuple[int, bytes, int, int]], technique: str = "dfs") -> list[tuple[float, float]]:
+    """Return the (white score, black score) of each of the given game records (see game_record), in order.
+
+    With NumPy, the records are scored in one batch per board size. Without it, every board is rebuilt
+    and scored with Board.calculate_score.
+    """
+    if np is None:
+        scores = []
+        for size, colors, black_captured, white_captured in records:
+            board = Board(size)
+            colors_by_code = list(COLOR_CODES)
+            for index, code in enumerate(colors):
+                if code != 0:
+                    board.add_stone(index // size, index % size, colors_by_code[code])
+            black_owned, white_owned = board.calculate_score(technique)
+            scores.append((KOMI + len(white_owned) + white_captured, len(black_owned) + black_captured))
+        return scores
+
+    scores = [None] * len(records)
+    by_size = {}
+    for i, record in enumerate(records):
+        by_size.setdefault(record[0], []).append(i)
+    for size, indices in by_size.items():
+        stack = np.frombuffer(b''.join(records[i][1] for i in indices), dtype=np.int8).reshape(-1, size, size)
+        white_scores, black_scores = batch_scores(stack, [records[i][2] for i in indices],
+                                                  [records[i][3] for i in indices], technique)
+        for i, white_score, black_score in zip(indices, white_scores.tolist(), black_scores.tolist()):
+            scores[i] = (white_score, black_score)
+    return scores
+
+
+def score_games(games: list[Game], technique: str = "dfs") -> list[tuple[float, float]]:
+    """Return the Game.overall_score of each of the given games, in order, scoring them in batches with NumPy
+    if it is installed"""
+    if np is None:
+        return [game.overall_score(technique) for game in games]
+    return score_records([game_record(game) for game in games], technique)
+
+
+def _require_numpy() -> None:
+    """Raise ImportError if NumPy is not installed"""
+    if np is None:
+        raise ImportError('batch scoring of stacks of boards requires numpy (see requirements.txt)')
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
@@ -0,0 +1,379 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains an alternative board engine which stores the board as integer
+bitboards rather than as a graph of Stone objects. It offers the same interface as
+board.Board, so a Game can be created with a BitBoard as its active board.
+
+Every point (x, y) on the board is given the index x * size + y, and bit number index
+of each bitboard is set when that point is occupied. Groups, liberties and territories
+are then found using shifts and masks on whole bitboards at once.
+
+Since groups are flood filled again on every move, a Game played on a BitBoard is slower than one
+played on a Board, which keeps its chains and liberties up to date as stones are played (about
+3 times slower on 9x9 boards, and 6 times on 19x19). The rest of the project therefore plays its
+games on a Board.
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+from board import zobrist_keys, zobrist_key, point_neighbours
+
+# maps a board size to the masks used by every BitBoard of that size:
+# (full board, points on the first row, points on the last row, neighbours of each point)
+_GEOMETRY: dict[int, tuple[int, int, int, list[int]]] = {}
+
+
+def board_geometry(size: int) -> tuple[int, int, int, list[int]]:
+    """Return the masks describing a board of the given size.
+
+    The masks are computed only once per size and are shared by every BitBoard of that size.
+
+    Preconditions:
+        - size > 0
+    """
+    if size not in _GEOMETRY:
+        full = (1 << (size * size)) - 1
+        first_row, last_row = 0, 0
+        for x in range(size):
+            first_row |= 1 << (x * size)
+            last_row |= 1 << (x * size + size - 1)
+
+        neighbour_masks = [sum(1 << neighbour for neighbour in neighbours) for neighbours in point_neighbours(size)]
+
+        _GEOMETRY[size] = (full, first_row, last_row, neighbour_masks)
+    return _GEOMETRY[size]
+
+
+def _iterate_bits(mask: int) -> list[int]:
+    """Return the index of every set bit of the given mask, in increasing order."""
+    indices = []
+    while mask:
+        lowest = mask & -mask
+        indices.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return indices
+
+
+class BitBoard:
+    """
+    A class that represents the game board using bitboards.
+
+    Instance Attributes:
+        size (int): The size of the board (i.e. the number of rows and columns).
+        black (int): A bitboard of the points occupied by black stones.
+        white (int): A bitboard of the points occupied by white stones.
+        empty (int): A bitboard of the points occupied by neither colour.
+        zobrist_hash (int): The Zobrist hash of the current position, identical to that of an equal Board.
+
+    Representation Invariants:
+        - self.size > 0
+        - self.black & self.white == 0
+        - self.black | self.white | self.empty == (1 << (self.size * self.size)) - 1
+    """
+    size: int
+    black: int
+    white: int
+    empty: int
+    zobrist_hash: int
+
+    def __init__(self, size: int = 9) -> None:
+        """
+        Initializes an empty BitBoard of the given size.
+
+        Args:
+            size (int): The size of the board. Defaults to 9.
+
+        Preconditions:
+            - size >= 9
+        """
+        self.size = size
+        self._full, self._first_row, self._last_row, self._neighbour_masks = board_geometry(size)
+        self.black = 0
+        self.white = 0
+        self.empty = self._full
+        self._zobrist_keys = zobrist_keys(size)
+        self.zobrist_hash = 0
+
+    def copy(self) -> BitBoard:
+        """Return an independent copy of this board, sharing the masks and Zobrist keys of its size"""
+        board = BitBoard.__new__(BitBoard)
+        board.__dict__.update(self.__dict__)
+        return board
+
+    def get_color(self, x: int, y: int) -> str:
+        """Return the colour of the stone at the given coordinates, or "Neither" if the point is empty
+
+        Preconditions:
+            - self.is_valid_coord(x, y)
+        """
+        bit = 1 << (x * self.size + y)
+        if self.black & bit:
+            return "Black"
+        elif self.white & bit:
+            return "White"
+        else:
+            return "Neither"
+
+    def add_stone(self, x: int, y: int, color: str = "Neither") -> None:
+        """
+        Sets the point at the specified position to the given colour. Does not capture any stones.
+
+        Args:
+            x (int): The x-coordinate of the position.
+            y (int): The y-coordinate of the position.
+            color (str): The color of the stone. Defaults to "Neither".
+        Preconditions:
+            - x<self.size and y<self.size and 0<=x and 0<=y
+        """
+        index = x * self.size + y
+        bit = 1 << index
+        self.zobrist_hash ^= zobrist_key(self._zobrist_keys, index, self.get_color(x, y))
+        self.zobrist_hash ^= zobrist_key(self._zobrist_keys, index, color)
+        self.black &= ~bit
+        self.white &= ~bit
+        self.empty &= ~bit
+        if color == "Black":
+            self.black |= bit
+        elif color == "White":
+            self.white |= bit
+        else:
+            self.empty |= bit
+
+    def is_valid_coord(self, x: int, y: int) -> bool:
+        """Check if a coordinate is valid for the board."""
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    def is_valid_move(self, x: int, y: int, color: str) -> bool:
+        """Check if a coordinate is valid for the board. It does not overwrite any stone, is not placed in a location
+        that leads to instant death, and within boundaries of the board.
+
+        NOTE: It does not (and should not) mutate the board
+
+        Preconditions:
+            - color in {'Black' , 'White'}
+        """
+        if color not in {'Black', 'White'}:
+            raise ValueError
+        elif not self.is_valid_coord(x, y):
+            return False
+
+        bit = 1 << (x * self.size + y)
+        if not self.empty & bit:
+            return False
+
+        neighbours = self._neighbour_masks[x * self.size + y]
+        if neighbours & self.empty:
+            return True
+
+        own, opponent = self._stones_of(color)
+        own |= bit
+        empty = self.empty & ~bit
+        # a move that captures an adjacent group is always allowed
+        for index in _iterate_bits(neighbours & opponent):
+            if not self._liberties(self._chain(1 << index, opponent), empty):
+                return True
+        return self._liberties(self._chain(bit, own), empty) != 0
+
+    def play_stone(self, x: int, y: int, color: str) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+        """Place a stone of the given colour and remove every group that is left without liberties.
+
+        Returns a tuple containing the opponent stones that were captured, and the stones of the given colour
+        that were removed because the move was a suicide.
+
+        Preconditions:
+            - color in {'Black' , 'White'}
+            - self.get_color(x, y) == "Neither"
+        """
+        self.add_stone(x, y, color)
+        index = x * self.size + y
+        own, opponent = self._stones_of(color)
+
+        captured = 0
+        for neighbour in _iterate_bits(self._neighbour_masks[index] & opponent):
+            if (1 << neighbour) & captured:
+                continue
+            chain = self._chain(1 << neighbour, opponent)
+            if not self._liberties(chain, self.empty):
+                captured |= chain
+        self._remove(captured)
+
+        suicided = 0
+        chain = self._chain(1 << index, own)
+        if not self._liberties(chain, self.empty):
+            suicided = chain
+            self._remove(suicided)
+
+        return self._to_coords(captured), self._to_coords(suicided)
+
+    def hash_after_move(self, x: int, y: int, color: str) -> int:
+        """Return the Zobrist hash of the position reached by playing the given move, including its captures.
+
+        NOTE: It does not mutate the board
+
+        Preconditions:
+            - color in {'Black' , 'White'}
+            - self.is_valid_move(x, y, color)
+        """
+        index = x * self.size + y
+        new_hash = self.zobrist_hash ^ zobrist_key(self._zobrist_keys, index, color)
+        opponent = self._stones_of(color)[1]
+        empty = self.empty & ~(1 << index)
+        captured = 0
+        for neighbour in _iterate_bits(self._neighbour_masks[index] & opponent):
+            if (1 << neighbour) & captured:
+                continue
+            chain = self._chain(1 << neighbour, opponent)
+            if not self._liberties(chain, empty):
+                captured |= chain
+        opponent_color = "White" if color == "Black" else "Black"
+        for point in _iterate_bits(captured):
+            new_hash ^= zobrist_key(self._zobrist_keys, point, opponent_color)
+        return new_hash
+
+    def get_liberties(self, x: int, y: int) -> list[tuple[int, int]]:
+        """Return the coordinates of every liberty of the chain containing the stone at the given coordinates
+
+        Preconditions:
+            - self.get_color(x, y) in {'Black', 'White'}
+        """
+        stones = self._stones_of(self.get_color(x, y))[0]
+        return self._to_coords(self._liberties(self._chain(1 << (x * self.size + y), stones), self.empty))
+
+    def capture_stones(self, x: int, y: int) -> int:
+        """turns all same color stones connected to the stone at the given coordinates into Neither
+        Returns the number of stones captured, as Board.capture_stones(x, y) does
+
+        Preconditions:
+            - Assume the stone at the given coordinates is dead
+            - self.get_color(x, y) in {'Black', 'White'}
+        """
+        color = self.get_color(x, y)
+        if color not in {'Black', 'White'}:
+            raise ValueError
+        chain = self._chain(1 << (x * self.size + y), self._stones_of(color)[0])
+        self._remove(chain)
+        return chain.bit_count()
+
+    def calculate_score(self, technique: str) -> list[list[tuple[int, int]]]:
+        """Calculates the territory of both players.
+
+        Returns the same result as Board.calculate_score: a list containing the coordinates of the points owned by
+        black, and the coordinates of the points owned by white.
+        """
+        black_owned, white_owned = 0, 0
+        # maps the index of a stone to the colours it can see through its adjacent regions (1 black, 2 white)
+        stone_seen = {}
+        unvisited = self.empty
+        while unvisited:
+            region = self._chain(unvisited & -unvisited, self.empty)
+            unvisited &= ~region
+            border = self._dilate(region) & ~region
+            black_border, white_border = border & self.black, border & self.white
+
+            if black_border and not white_border:
+                black_owned |= region
+            elif white_border and not black_border:
+                white_owned |= region
+
+            if technique != "flood_fill":
+                # a stone takes the colours surrounding the empty regions next to it, not counting itself
+                black_count, white_count = black_border.bit_count(), white_border.bit_count()
+                for index in _iterate_bits(border):
+                    bit = 1 << index
+                    if bit & self.black:
+                        black_seen, white_seen = black_count > 1, white_count > 0
+                    else:
+                        black_seen, white_seen = black_count > 0, white_count > 1
+                    stone_seen[index] = stone_seen.get(index, 0) | (1 if black_seen else 0) | (2 if white_seen else 0)
+
+        if technique == "flood_fill":
+            # stones always belong to their own colour
+            black_owned |= self.black
+            white_owned |= self.white
+        else:
+            for index in _iterate_bits(self.black | self.white):
+                seen = stone_seen.get(index, 0)
+                neighbours = self._neighbour_masks[index]
+                if neighbours & self.black:
+                    seen |= 1
+                if neighbours & self.white:
+                    seen |= 2
+                if seen == 1:
+                    black_owned |= 1 << index
+                elif seen == 2:
+                    white_owned |= 1 << index
+
+        return [self._to_coords(black_owned), self._to_coords(white_owned)]
+
+    def _stones_of(self, color: str) -> tuple[int, int]:
+        """Return the bitboards of the given colour and of its opponent"""
+        if color == "Black":
+            return self.black, self.white
+        else:
+            return self.white, self.black
+
+    def _dilate(self, mask: int) -> int:
+        """Return the given mask together with every point adjacent to it"""
+        size = self.size
+        return (mask
+                | ((mask << 1) & ~self._first_row)
+                | ((mask >> 1) & ~self._last_row)
+                | (mask << size)
+                | (mask >> size)) & self._full
+
+    def _chain(self, seed: int, stones: int) -> int:
+        """Return the connected group of points in stones that contains the seed point(s)"""
+        chain = seed
+        while True:
+            grown = self._dilate(chain) & stones
+            if grown == chain:
+                return chain
+            chain = grown
+
+    def _liberties(self, chain: int, empty: int) -> int:
+        """Return the bitboard of empty points adjacent to the given chain"""
+        return self._dilate(chain) & empty
+
+    def _remove(self, mask: int) -> None:
+        """Turns every point of the given mask into Neither"""
+        for index in _iterate_bits(self.black & mask):
+            self.zobrist_hash ^= self._zobrist_keys[index][0]
+        for index in _iterate_bits(self.white & mask):
+            self.zobrist_hash ^= self._zobrist_keys[index][1]
+        self.black &= ~mask
+        self.white &= ~mask
+        self.empty |= mask
+
+    def _to_coords(self, mask: int) -> list[tuple[int, int]]:
+        """Return the coordinates of every point in the given mask, ordered by x and then y"""
+        return [divmod(index, self.size) for index in _iterate_bits(mask)]
+
+    def __str__(self) -> str:
+        """Print a visual representation of the board."""
+        ans = "-" * (self.size * 2 + 1) + '\n'
+        for y in range(self.size):
+            row = "|"
+            for x in range(self.size):
+                color = self.get_color(x, y)
+                if color == "Black":
+                    row += "○"
+                elif color == "White":
+                    row += "●"
+                else:
+                    row += " "
+                row += "|"
+            ans += row + '\n'
+            ans += "-" * (self.size * 2 + 1) + '\n'
+        return ans
@@ -18,10 +18,76 @@ See README file for instructions, project details, and the relevant copyright an
 """
 
 from __future__ import annotations
+import random
+from typing import Optional
 
 # from typing import Optional
 # rom typing import Dict, Tuple
 
+# maps a board size to the (black key, white key) pair of every point index on a board of that size
+_ZOBRIST_KEYS: dict[int, list[tuple[int, int]]] = {}
+
+
+def zobrist_keys(size: int) -> list[tuple[int, int]]:
+    """Return the random 64-bit keys used to hash positions on a board of the given size.
+
+    The keys are generated from a fixed seed, so the same position always has the same hash,
+    even across different runs of the program.
+
+    Preconditions:
+        - size > 0
+    """
+    if size not in _ZOBRIST_KEYS:
+        generator = random.Random(size)
+        _ZOBRIST_KEYS[size] = [(generator.getrandbits(64), generator.getrandbits(64)) for _ in range(size * size)]
+    return _ZOBRIST_KEYS[size]
+
+
+# maps a board size to the indices of the points adjacent to every point index on a board of that size
+_NEIGHBOURS: dict[int, list[tuple[int, ...]]] = {}
+
+
+def point_neighbours(size: int) -> list[tuple[int, ...]]:
+    """Return the indices of the points adjacent to every point index on a board of the given size.
+
+    The table is computed only once per size and is shared by every Board of that size. The number
+    of neighbours of a point is 4, 3 on an edge and 2 in a corner.
+
+    >>> point_neighbours(9)[0]
+    (9, 1)
+    >>> [len(neighbours) for neighbours in point_neighbours(19)[:3]]
+    [2, 3, 3]
+
+    Preconditions:
+        - size > 0
+    """
+    if size not in _NEIGHBOURS:
+        table = []
+        for x in range(size):
+            for y in range(size):
+                neighbours = []
+                if x + 1 < size:
+                    neighbours.append((x + 1) * size + y)
+                if x - 1 >= 0:
+                    neighbours.append((x - 1) * size + y)
+                if y + 1 < size:
+                    neighbours.append(x * size + y + 1)
+                if y - 1 >= 0:
+                    neighbours.append(x * size + y - 1)
+                table.append(tuple(neighbours))
+        _NEIGHBOURS[size] = table
+    return _NEIGHBOURS[size]
+
+
+def zobrist_key(keys: list[tuple[int, int]], index: int, color: str) -> int:
+    """Return the key of a stone of the given colour at the given point index, or 0 for an empty point"""
+    if color == "Black":
+        return keys[index][0]
+    elif color == "White":
+        return keys[index][1]
+    else:
+        return 0
+
 
 class Board:
     """
@@ -30,13 +96,30 @@ class Board:
     Instance Attributes:
         size (int): The size of the board (i.e. the number of rows and columns).
         grid (list): A 2D list representing the board, containing Stone objects.
+        zobrist_hash (int): The Zobrist hash of the current position, the xor of the keys of every stone.
 
     Representation Invariants:
         - self.size > 0
+
+    Every point (x, y) is also given the index x * size + y. The colour of every point is kept in a flat list
+    over these indices, and connected stones of the same colour (chains) are kept in a union-find structure
+    over them, together with the set of liberties of each chain. All of these are updated whenever a stone is
+    added or captured. The Stone objects of grid are only created the first time they are used, and kept in
+    sync with the colours from then on. The board should therefore only be changed through add_stone,
+    play_stone and capture_stones, rather than by setting the colour of a Stone directly.
     """
     size: int
-    # note that the inner list is each column of the board
-    grid: list[list[Stone]]
+    zobrist_hash: int
+    # the colour of each point index, and the indices of the points adjacent to it (shared by boards of this size)
+    _colors: list[str]
+    _neighbours: list[tuple[int, ...]]
+    # note that the inner list is each column of the board, None until the grid is first used
+    _grid: Optional[list[list[Stone]]]
+    _stones: Optional[list[Stone]]
+    # union-find parent of each occupied point, and the members and liberties of every chain, keyed by its root
+    _parent: list[int]
+    _members: dict[int, list[int]]
+    _liberties: dict[int, set[int]]
 
     def __init__(self, size: int = 9) -> None:
         """
@@ -52,18 +135,48 @@ class Board:
             - size >= 9
         """
         self.size = size
-        self.grid = [[Stone(x, y) for y in range(size)] for x in range(size)]
-
-        for column in self.grid:
-            for stone in column:
-                if stone.x + 1 < size:
-                    stone.add_neighbour(self.get_stone(stone.x + 1, stone.y))
-                if stone.x - 1 >= 0:
-                    stone.add_neighbour(self.get_stone(stone.x - 1, stone.y))
-                if stone.y + 1 < size:
-                    stone.add_neighbour(self.get_stone(stone.x, stone.y + 1))
-                if stone.y - 1 >= 0:
-                    stone.add_neighbour(self.get_stone(stone.x, stone.y - 1))
+        self._colors = ["Neither"] * (size * size)
+        self._neighbours = point_neighbours(size)
+        self._grid = None
+        self._stones = None
+        self._parent = list(range(size * size))
+        self._members = {}
+        self._liberties = {}
+        self._zobrist_keys = zobrist_keys(size)
+        self.zobrist_hash = 0
+
+    @property
+    def grid(self) -> list[list[Stone]]:
+        """A 2D list representing the board, containing Stone objects.
+
+        The stones are created the first time the grid is used.
+        """
+        if self._grid is None:
+            size = self.size
+            self._grid = [[Stone(x, y, self._colors[x * size + y], size) for y in range(size)] for x in range(size)]
+            self._stones = [stone for column in self._grid for stone in column]
+            for stone, neighbours in zip(self._stones, self._neighbours):
+                stone.neighbours = {divmod(neighbour, size): self._stones[neighbour] for neighbour in neighbours}
+        return self._grid
+
+    def copy(self) -> Board:
+        """Return an independent copy of this board.
+
+        Only the flat lists of colours and chains are copied: the neighbour table and Zobrist keys are shared,
+        and the copy creates its own Stone objects only if its grid is used.
+        """
+        board = Board.__new__(Board)
+        board.size = self.size
+        board._colors = list(self._colors)
+        board._neighbours = self._neighbours
+        board._grid = None
+        board._stones = None
+        board._parent = list(self._parent)
+        board._members = {root: list(members) for root, members in self._members.items()}
+        board._liberties = {root: set(liberties) for root, liberties in self._liberties.items()}
+        board._zobrist_keys = self._zobrist_keys
+        board.zobrist_hash = self.zobrist_hash
+        return board
 
     def __getitem__(self, position: tuple[int, int]) -> Stone:
         """Returns the Stone object at the specified position.
@@ -88,7 +201,28 @@ class Board:
         Preconditions:
             - x<self.size and y<self.size and 0<=x and 0<=y
         """
-        self.grid[x][y].color = color
+        index = x * self.size + y
+        if self._colors[index] == color:
+            return
+        elif self._colors[index] != "Neither":
+            self._remove_point(index)
+
+        self._set_color(index, color)
+        if color == "Neither":
+            return
+        self.zobrist_hash ^= zobrist_key(self._zobrist_keys, index, color)
+
+        self._parent[index] = index
+        self._members[index] = [index]
+        self._liberties[index] = set()
+        for neighbour in self._neighbours[index]:
+            neighbour_color = self._colors[neighbour]
+            if neighbour_color == "Neither":
+                self._liberties[self._find(index)].add(neighbour)
+            else:
+                self._liberties[self._find(neighbour)].discard(index)
+                if neighbour_color == color:
+                    self._union(index, neighbour)
 
     def get_stone(self, x: int, y: int) -> Stone:
         """Return the stone situated at the given coordinates
@@ -97,6 +231,16 @@ class Board:
         """
         return self.grid[x][y]
 
+    def get_color(self, x: int, y: int) -> str:
+        """Return the colour of the stone at the given coordinates, or "Neither" if the point is empty
+
+        Shared with bitboard.BitBoard, so callers do not depend on the Stone objects of this board.
+
+        Preconditions:
+            - self.is_valid_coord(x, y)
+        """
+        return self._colors[x * self.size + y]
+
     def is_valid_move(self, x: int, y: int, color: str) -> bool:
         """Check if a coordinate is valid for the board. It does not overwrite any stone, is not placed in a location
         that leads to instant death, and within boundaries of the board.
@@ -106,60 +250,237 @@ class Board:
         Preconditions:
             - color in {'Black' , 'White'}
         """
-        stone = self.get_stone(x, y)
         if color not in {'Black', 'White'}:
             raise ValueError
-        elif x < 0 or x > 8 or y < 0 or y > 8:
+        elif not self.is_valid_coord(x, y):
             return False
-        elif self.get_stone(x, y).color != "Neither":
+        elif self.get_color(x, y) != "Neither":
             return False
 
-        else:
-            stone.color = color
-            if any(neighbour.check_is_dead(set()) for neighbour in stone.neighbours.values()):
-                stone.color = 'Neither'
+        for neighbour in self._neighbours[x * self.size + y]:
+            neighbour_color = self._colors[neighbour]
+            if neighbour_color == "Neither":
                 return True
-
-            elif stone.check_is_dead(set()):
-                stone.color = 'Neither'
-                return False
-            else:
-                stone.color = 'Neither'
-        return True
+            liberties = len(self._liberties[self._find(neighbour)])
+            if neighbour_color == color and liberties > 1:
+                return True  # joins a chain which keeps another liberty
+            elif neighbour_color != color and liberties == 1:
+                return True  # captures the neighbouring chain
+        return False
 
     def is_valid_coord(self, x: int, y: int) -> bool:
         """Check if a coordinate is valid for the board."""
         return 0 <= x < self.size and 0 <= y < self.size
 
-    def calculate_score(self: Board, technique: str) -> list[list[tuple[int, int]], list[tuple[int, int]]]:
-        """Calculates the score for both players.
+    def play_stone(self, x: int, y: int, color: str) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+        """Place a stone of the given colour and remove every group that is left without liberties.
+
+        Returns a tuple containing the opponent stones that were captured, and the stones of the given colour
+        that were removed because the move was a suicide.
+
+        Preconditions:
+            - color in {'Black' , 'White'}
+            - self.get_color(x, y) == "Neither"
         """
-        black_score, white_score = 0.0, 0.0
-        black_territory, white_territory = 0, 0
-        black_territory_cord, white_territory_cord = [], []
+        self.add_stone(x, y, color)
+        index = x * self.size + y
 
-        for x in range(self.size):
-            for y in range(self.size):
-                # This code is relevant if you want to count the stones as well
-                # stone = self.get_stone(x, y)
-                # if stone.color == "Black":
-                #     black_score += 1
-                # elif stone.color == "White":
-                #     white_score += 1
-                # else:
-
-                # Captured stones are not counted as territory
-                territory_owner = self.get_territory_owner(x, y, technique)
-                if territory_owner == "Black":
-                    black_territory += 1
-                    black_territory_cord.append((x, y))
-                elif territory_owner == "White":
-                    white_territory += 1
-                    white_territory_cord.append((x, y))
-
-        black_score += black_territory
-        white_score += white_territory
-        return [black_territory_cord, white_territory_cord]
+        captured = []
+        for neighbour in self._neighbours[index]:
+            neighbour_color = self._colors[neighbour]
+            if neighbour_color not in {color, 'Neither'} and not self._liberties[self._find(neighbour)]:
+                captured.extend(self._remove_chain(self._find(neighbour)))
+
+        suicided = []
+        if not self._liberties[self._find(index)]:
+            suicided = self._remove_chain(self._find(index))
+
+        return sorted(divmod(point, self.size) for point in captured), \
+            sorted(divmod(point, self.size) for point in suicided)
+
+    def hash_after_move(self, x: int, y: int, color: str) -> int:
+        """Return the Zobrist hash of the position reached by playing the given move, including its captures.
+
+        NOTE: It does not mutate the board
+
+        Preconditions:
+            - color in {'Black' , 'White'}
+            - self.is_valid_move(x, y, color)
+        """
+        index = x * self.size + y
+        new_hash = self.zobrist_hash ^ zobrist_key(self._zobrist_keys, index, color)
+        captured = set()
+        for neighbour in self._neighbours[index]:
+            neighbour_color = self._colors[neighbour]
+            root = self._find(neighbour) if neighbour_color != "Neither" else -1
+            if neighbour_color not in {color, "Neither"} and root not in captured \
+                    and self._liberties[root] == {index}:
+                captured.add(root)
+                for point in self._members[root]:
+                    new_hash ^= zobrist_key(self._zobrist_keys, point, neighbour_color)
+        return new_hash
+
+    def count_liberties(self, x: int, y: int) -> int:
+        """Return the number of liberties of the chain containing the stone at the given coordinates
+
+        Preconditions:
+            - self.get_color(x, y) in {'Black', 'White'}
+        """
+        return len(self._liberties[self._find(x * self.size + y)])
+
+    def get_liberties(self, x: int, y: int) -> list[tuple[int, int]]:
+        """Return the coordinates of every liberty of the chain containing the stone at the given coordinates
+
+        Preconditions:
+            - self.get_color(x, y) in {'Black', 'White'}
+        """
+        return sorted(divmod(point, self.size) for point in self._liberties[self._find(x * self.size + y)])
+
+    def get_chain(self, x: int, y: int) -> list[tuple[int, int]]:
+        """Return the coordinates of every stone in the chain containing the stone at the given coordinates
+
+        Preconditions:
+            - self.get_color(x, y) in {'Black', 'White'}
+        """
+        return sorted(divmod(point, self.size) for point in self._members[self._find(x * self.size + y)])
+
+    def is_dead(self, x: int, y: int) -> bool:
+        """Return whether the chain containing the stone at the given coordinates has no liberties left"""
+        return self.get_color(x, y) != "Neither" and self.count_liberties(x, y) == 0
+
+    def _set_color(self, index: int, color: str) -> None:
+        """Set the colour of the given point, and of its Stone if the grid has been created"""
+        self._colors[index] = color
+        if self._stones is not None:
+            self._stones[index].color = color
+
+    def _find(self, index: int) -> int:
+        """Return the root of the chain containing the given point, halving the path along the way"""
+        parent = self._parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def _union(self, first: int, second: int) -> None:
+        """Merge the chains containing the two given points, keeping the root of the larger chain"""
+        first, second = self._find(first), self._find(second)
+        if first == second:
+            return
+        elif len(self._members[first]) < len(self._members[second]):
+            first, second = second, first
+        self._parent[second] = first
+        self._members[first].extend(self._members.pop(second))
+        self._liberties[first] |= self._liberties.pop(second)
+
+    def _remove_chain(self, root: int) -> list[int]:
+        """Turns every stone of the chain with the given root into Neither, giving their points
+        back as liberties to the neighbouring chains. Returns the indices of the removed stones.
+        """
+        members = self._members.pop(root)
+        del self._liberties[root]
+        for point in members:
+            self.zobrist_hash ^= zobrist_key(self._zobrist_keys, point, self._colors[point])
+            self._set_color(point, "Neither")
+        for point in members:
+            for neighbour in self._neighbours[point]:
+                if self._colors[neighbour] != "Neither":
+                    self._liberties[self._find(neighbour)].add(point)
+        return members
+
+    def _remove_point(self, index: int) -> None:
+        """Turns the single stone at the given point into Neither, splitting its chain if needed"""
+        root = self._find(index)
+        members = self._members.pop(root)
+        del self._liberties[root]
+        color = self._colors[index]
+        self.zobrist_hash ^= zobrist_key(self._zobrist_keys, index, color)
+        self._set_color(index, "Neither")
+        for neighbour in self._neighbours[index]:
+            if self._colors[neighbour] not in {color, "Neither"}:
+                self._liberties[self._find(neighbour)].add(index)
+
+        # rebuild what is left of the chain, which may now be split into several chains
+        remaining = [point for point in members if point != index]
+        for point in remaining:
+            self._parent[point] = point
+            self._members[point] = [point]
+            self._liberties[point] = {neighbour for neighbour in self._neighbours[point]
+                                      if self._colors[neighbour] == "Neither"}
+        for point in remaining:
+            for neighbour in self._neighbours[point]:
+                if self._colors[neighbour] == color:
+                    self._union(point, neighbour)
+
+    def calculate_score(self: Board, technique: str) -> list[list[tuple[int, int]], list[tuple[int, int]]]:
+        """Calculates the territory of both players.
+
+        Returns a list containing the coordinates of the points owned by black, and the coordinates of the points
+        owned by white, as given by get_territory_owner with the given technique for every point.
+
+        Every empty region is labelled once, and the stones bordering it are counted by colour, so the whole
+        board is scored in a single pass instead of one search per point.
+        """
+        colors = self._colors
+        neighbours = self._neighbours
+        owners = ["Neither"] * len(colors)
+        # the empty region of every empty point, and the number of black and white stones bordering each region
+        region_of = [-1] * len(colors)
+        region_borders = []
+
+        for start in range(len(colors)):
+            if colors[start] != "Neither" or region_of[start] != -1:
+                continue
+            region = len(region_borders)
+            region_of[start] = region
+            members = [start]
+            border = set()
+            i = 0
+            while i < len(members):
+                for neighbour in neighbours[members[i]]:
+                    if colors[neighbour] != "Neither":
+                        border.add(neighbour)
+                    elif region_of[neighbour] == -1:
+                        region_of[neighbour] = region
+                        members.append(neighbour)
+                i += 1
+            black_border = sum(1 for point in border if colors[point] == "Black")
+            white_border = len(border) - black_border
+            region_borders.append((black_border, white_border))
+            # Captured stones are not counted as territory
+            if black_border and not white_border:
+                owner = "Black"
+            elif white_border and not black_border:
+                owner = "White"
+            else:
+                continue
+            for point in members:
+                owners[point] = owner
+
+        for point, color in enumerate(colors):
+            if color == "Neither":
+                continue
+            elif technique == "flood_fill":
+                # flood fill counts the stone itself
+                owners[point] = color
+                continue
+            # dfs sees the stones next to this one, and those around its neighbouring regions except itself
+            seen = set()
+            for neighbour in neighbours[point]:
+                if colors[neighbour] != "Neither":
+                    seen.add(colors[neighbour])
+                else:
+                    black_border, white_border = region_borders[region_of[neighbour]]
+                    if black_border - (color == "Black") > 0:
+                        seen.add("Black")
+                    if white_border - (color == "White") > 0:
+                        seen.add("White")
+            if len(seen) == 1:
+                owners[point] = seen.pop()
+
+        size = self.size
+        return [[divmod(point, size) for point, owner in enumerate(owners) if owner == "Black"],
+                [divmod(point, size) for point, owner in enumerate(owners) if owner == "White"]]
 
     # def is_valid_coord_do(self, x: int, y: int) -> bool:
     #     """Check if a coordinate is valid for the board."""
@@ -229,22 +550,18 @@ class Board:
        """
         raise NotImplementedError
 
-    def capture_stones(self, stone: Stone) -> int:
-        """turns all same color stones connected to the given stone into Neither
+    def capture_stones(self, x: int, y: int) -> int:
+        """turns all same color stones connected to the stone at the given coordinates into Neither
+        Returns the number of stones captured, as bitboard.BitBoard.capture_stones(x, y) does
+
         Preconditions:
-            - Assume the given stone is dead
-            - any([(stone in row) for row in self.grid])
+            - Assume the stone at the given coordinates is dead
+            - self.get_color(x, y) in {'Black', 'White'}
         """
-        if stone.color not in {'Black', 'White'}:
+        if self.get_color(x, y) not in {'Black', 'White'}:
             raise ValueError
         else:
-            captured_so_far = 1
-            color = stone.color
-            stone.color = 'Neither'
-            for neighbour in stone.neighbours.values():
-                if neighbour.color == color:
-                    captured_so_far += self.capture_stones(neighbour)
-            return captured_so_far
+            return len(self._remove_chain(self._find(x * self.size + y)))
 
     ################################################################################
     # functions for testing purposes (some redundancy, not to be used)
@@ -278,7 +595,7 @@ class Board:
             - all((stone in self.grid) for stone in stones)
         """
         for stone in stones:
-            self.grid[stone.x][stone.y].delete_stone()
+            self.add_stone(stone.x, stone.y, "Neither")
 
     def __str__(self) -> str:
         """Print a visual representation of the board."""
@@ -286,10 +603,10 @@ class Board:
         for y in range(self.size):
             row = "|"
             for x in range(self.size):
-                stone = self.get_stone(x, y)
-                if stone.color == "Black":
+                color = self.get_color(x, y)
+                if color == "Black":
                     row += "○"
-                elif stone.color == "White":
+                elif color == "White":
                     row += "●"
                 else:
                     row += " "
@@ -356,7 +673,7 @@ class Stone:
     neighbours: dict[tuple[int, int], Stone]
     max_num_neighbours: int
 
-    def __init__(self, x: int, y: int, color: str = "Neither") -> None:
+    def __init__(self, x: int, y: int, color: str = "Neither", size: int = 9) -> None:
         """
         Initializes a new stone with the specified color and position.
 
@@ -364,18 +681,17 @@ class Stone:
             color (str, optional): The color of the stone. Defaults to "Neither".
             x (int): The x position of the stone on the board.
             y (int): The y position of the stone on the board.
+            size (int, optional): The size of the board the stone is on. Defaults to 9.
         """
         self.color = color
         self.neighbours = {}
         self.x = x
         self.y = y
         max_neighbours = 4  # default for stones not on edge or corner
-        if x == 0 or x == 8:  # stone is on left or right edge
-            max_neighbours = 3
-        elif y == 0 or y == 8:  # stone is on top or bottom edge
-            max_neighbours = 3
-        if (x == 0 and y == 0) or (x == 0 and y == 8) or (x == 8 and y == 0) or (x == 8 and y == 8):
-            max_neighbours = 2  # stone is in a corner
+        if x == 0 or x == size - 1:  # stone is on left or right edge
+            max_neighbours -= 1
+        if y == 0 or y == size - 1:  # stone is on top or bottom edge (or in a corner, if also on a side)
+            max_neighbours -= 1
         self.max_num_neighbours = max_neighbours
 
     def add_neighbour(self, neighbour: Stone) -> None:
@@ -496,13 +812,13 @@ if __name__ == '__main__':
     # print(board[(1, 6)])
     # # print(board)
     # print(board.print_max_neighbours())
-    board.grid[8][0].color = 'White'
-    board.grid[7][0].color = 'White'
-    # board.capture_stones(board.grid[7][0])
-    board.grid[8][1].color = 'Black'
-    board.grid[7][1].color = 'Black'
-    board.grid[6][0].color = 'Black'
-    print(board.grid[7][0].check_is_dead(set()))
+    board.add_stone(8, 0, 'White')
+    board.add_stone(7, 0, 'White')
+    # board.capture_stones(7, 0)
+    board.add_stone(8, 1, 'Black')
+    board.add_stone(7, 1, 'Black')
+    board.add_stone(6, 0, 'Black')
+    print(board.is_dead(7, 0))
 
     # When you are ready to check your work with python_ta, uncomment the following lines.
     # (In PyCharm, select the lines below and press Ctrl/Cmd + / to toggle comments.)
@@ -17,27 +17,58 @@ work.
 
 See README file for instructions, project details, and the relevant copyright and usage information
 """
-from board import Board
-from typing import Optional
+from __future__ import annotations
+from board import Board, point_neighbours
+from bitboard import BitBoard
+import random
+from types import ModuleType
+from typing import Iterable, Optional
+
+# mixed into the position key whenever it is white's turn, so that the same stones with a different
+# player to move are treated as different positions
+WHITE_TO_MOVE_KEY = 0x9E3779B97F4A7C15
+# the points given to white in overall_score to make up for playing second
+KOMI = 2.5
+
+
+def handicap_first_player(handicap: int) -> str:
+    """Return the player who makes the first move of a game with the given handicap: white moves first
+    once black has been given two or more handicap stones
+
+    >>> handicap_first_player(0)
+    'Black'
+    >>> handicap_first_player(5)
+    'White'
+    """
+    return "White" if handicap >= 2 else "Black"
 
 
 class Game:
     """A class representing the state of a game of Go.
 
     Instance Attributes:
-        - board: representation of the current state of the board
+        - board: representation of the current state of the board, either a Board or a BitBoard
         - current_player: who's turn is it, either "Black" or "White
         - moves: a list that represents the sequence of moves played so far in the game
         - board_size: the size of the board. Note that the board is always a square
         - black_captured: the amount of stones captured BY BLACK so far
         - white_captured: the amount of stones captured BY WHITE so far
+        - position_history: the Zobrist hashes of every board position reached so far in the game
+        - handicap: the number of handicap stones given to black, or 0 for an even game
+        - setup_stones: the (colour, x, y) stones placed on the board before the first move (e.g. handicap stones)
+        - first_player: the player who made (or will make) the first move
+        - _undo_stack: an undo record for every move and pass played since the game was created, the last one at
+                       the end (see undo_move)
+        - _legal_moves: the indices (x * board_size + y) of the points where each colour may legally place a stone
+                        according to board.is_valid_move, kept up to date after every move. Moves repeating an
+                        earlier position are only excluded when available_moves is called.
     Representation Invariants:
         - self.current_player in {'Black','White'}
         - self.board_size > 0
         - self.black_captured>=0
         - self.white_captured>=0
     """
-    board: Board
+    board: Board | BitBoard
     current_player: str
     # note that the tuple is in form (move number starting from 1, x, y)
     # x and y defined such that origin is centered in the top left corner
@@ -45,22 +76,38 @@ class Game:
     board_size: int
     black_captured: int
     white_captured: int
-
-    def __init__(self, active_board: Optional[Board] = None, player_turn: str = "Black",
-                 move_sequence: Optional[list[tuple[int, int, int]]] = None, size: int = 9) -> None:
+    position_history: set[int]
+    handicap: int
+    setup_stones: list[tuple[str, int, int]]
+    first_player: str
+    _legal_moves: dict[str, set[int]]
+    # (x, y, captured points, suicided points, black_captured, white_captured, previous player,
+    #  whether the position was new to position_history), with x = y = -1 for a pass
+    _undo_stack: list[tuple[int, int, list[tuple[int, int]], list[tuple[int, int]], int, int, str, bool]]
+
+    def __init__(self, active_board: Optional[Board | BitBoard] = None, player_turn: str = "Black",
+                 move_sequence: Optional[list[tuple[int, int, int]]] = None, size: int = 9,
+                 setup_stones: Optional[list[tuple[str, int, int]]] = None, handicap: int = 0) -> None:
         """
         Initialise a new Go game - defaults to a 9x9 empty board
 
         Note: board sizes are typically 9x9, 13x13, or 19x19 (19x19 is by far the most common of them all)
 
+        When no active board is given, the given setup stones are placed on the new board before anything else.
+        An active board must already have them, since later moves may have replaced or captured some of them.
+        In a handicap game, player_turn should be handicap_first_player(handicap) for a new game.
+
         Preconditions:
             - moves on the active board match those of the given move sequence
             - all((0 <= move[1] <= size) and (0 <= move[2] <= size) for move in move_sequence)
             - size >= 9
             - player_turn in {'Black','White'}
         """
+        self.setup_stones = [] if setup_stones is None else list(setup_stones)
         if active_board is None:
             self.board = Board(size=size)  # initialise a new board with the give size
+            for color, x, y in self.setup_stones:
+                self.board.add_stone(x, y, color)
         else:
             self.board = active_board
         self.current_player = player_turn
@@ -69,39 +116,73 @@ class Game:
         else:
             self.moves = move_sequence
         self.board_size = size
+        self.handicap = handicap
+        other_player = "White" if player_turn == "Black" else "Black"
+        self.first_player = player_turn if len(self.moves) % 2 == 0 else other_player
 
         self.white_captured = 0
         self.black_captured = 0
+        self.position_history = {self.board.zobrist_hash}
+        self._undo_stack = []
+        self._legal_moves = {"Black": set(), "White": set()}
+        self._update_legal_moves([(x, y) for x in range(self.board.size) for y in range(self.board.size)])
+        # the results of board.calculate_score for the current board, by (zobrist hash, technique)
+        self._territory_cache = {}
+
+    def copy(self) -> Game:
+        """Return an independent copy of this game, e.g. to play out a position several times.
+
+        The board is copied with its own copy method, which only copies flat lists (or integers for a BitBoard),
+        and the move lists and sets are copied without copying the tuples they contain.
+        """
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game.board = self.board.copy()
+        game.moves = list(self.moves)
+        game.setup_stones = list(self.setup_stones)
+        game.position_history = set(self.position_history)
+        game._undo_stack = list(self._undo_stack)
+        game._legal_moves = {color: set(legal) for color, legal in self._legal_moves.items()}
+        game._territory_cache = dict(self._territory_cache)
+        return game
 
     def play_move(self, x: int, y: int) -> bool:
         """Plays the given move on the board
         Given the location of a new move, mutates the board and game.
-        Returns whether updating was sucessful or not
+        Returns whether updating was sucessful or not. A move which would repeat an earlier
+        board position (positional superko) is not played. The move (-1, -1) passes the turn.
 
         NOTE: recall that the x and y defined with the origin centered in the top left corner
 
         Preconditions:
-            - 0 <= x < self.board.size
-            - 0 <= y < self.board.size
+            - (x, y) == (-1, -1) or 0 <= x < self.board.size
+            - (x, y) == (-1, -1) or 0 <= y < self.board.size
         """
-        stone = self.board.get_stone(x, y)
-        if stone.color == "Neither":
-            self.board.add_stone(x, y, self.current_player)
+        if (x, y) == (-1, -1):
+            self.pass_turn()
+            return True
+        elif self.board.get_color(x, y) == "Neither" and not self.repeats_position(x, y):
             # moves start at 1 and increase by one each time
             new_move = (len(self.moves) + 1, x, y)
             self.moves.append(new_move)
+            black_captured, white_captured = self.black_captured, self.white_captured
+
+            captured, suicided = self.board.play_stone(x, y, self.current_player)
 
-            for adjacent in stone.neighbours.values():
-                if adjacent is stone:
-                    pass
-                elif adjacent.check_is_dead(set()):
-                    color = adjacent.color
+            # remember that the attribute keeps track of amount captured BY player
+            if self.current_player == "Black":
+                self.black_captured += len(captured)
+                self.white_captured += len(suicided)
+            else:
+                self.white_captured += len(captured)
+                self.black_captured += len(suicided)
 
-                    # remember that the attribute keeps track of amount captured BY player
-                    if color == "White":
-                        self.black_captured += self.board.capture_stones(adjacent)
-                    else:
-                        self.white_captured += self.board.capture_stones(adjacent)
+            is_new_position = self.board.zobrist_hash not in self.position_history
+            self.position_history.add(self.board.zobrist_hash)
+            self._update_legal_moves(self._affected_points([(x, y)] + captured + suicided))
+            self._territory_cache.clear()
+            self._undo_stack.append((x, y, captured, suicided, black_captured, white_captured,
+                                     self.current_player, is_new_position))
 
             # update current player attribute
             self.current_player = "White" if self.current_player == "Black" else "Black"
@@ -109,6 +190,94 @@ class Game:
         else:
             return False
 
+    def undo_move(self) -> bool:
+        """Take back the last move (or pass) played with play_move or pass_turn, restoring the board,
+        the captured stones, the player to move and the position history exactly as they were before it.
+        Returns whether there was a move to take back.
+
+        >>> game = Game()
+        >>> game.play_move(2, 3)
+        True
+        >>> game.undo_move()
+        True
+        >>> game.board.get_color(2, 3), game.current_player, game.moves
+        ('Neither', 'Black', [])
+        >>> game.undo_move()
+        False
+        """
+        if not self._undo_stack:
+            return False
+        x, y, captured, suicided, black_captured, white_captured, previous_player, is_new_position = \
+            self._undo_stack.pop()
+        self.moves.pop()
+        self.current_player = previous_player
+        if (x, y) == (-1, -1):
+            return True
+
+        if is_new_position:
+            self.position_history.discard(self.board.zobrist_hash)
+        opponent = "White" if previous_player == "Black" else "Black"
+        self.board.add_stone(x, y, "Neither")
+        for stone_x, stone_y in captured:
+            self.board.add_stone(stone_x, stone_y, opponent)
+        for stone_x, stone_y in suicided:
+            if (stone_x, stone_y) != (x, y):
+                self.board.add_stone(stone_x, stone_y, previous_player)
+        self.black_captured, self.white_captured = black_captured, white_captured
+        self._update_legal_moves(self._affected_points([(x, y)] + captured + suicided))
+        self._territory_cache.clear()
+        return True
+
+    def repeats_position(self, x: int, y: int) -> bool:
+        """Return whether playing the given move for the current player would recreate a board position
+        that has already occurred in this game
+
+        Preconditions:
+            - self.board.is_valid_move(x, y, self.current_player)
+        """
+        return self.board.hash_after_move(x, y, self.current_player) in self.position_history
+
+    def _affected_points(self, changed: list[tuple[int, int]]) -> set[tuple[int, int]]:
+        """Return every point whose legality may have changed after the given points changed colour:
+        the changed points, the empty points next to them, and the liberties of the chains next to them"""
+        size = self.board.size
+        neighbours = point_neighbours(size)
+        affected = set(changed)
+        for x, y in changed:
+            for neighbour in neighbours[x * size + y]:
+                neighbour_x, neighbour_y = divmod(neighbour, size)
+                if self.board.get_color(neighbour_x, neighbour_y) == "Neither":
+                    affected.add((neighbour_x, neighbour_y))
+                else:
+                    affected.update(self.board.get_liberties(neighbour_x, neighbour_y))
+        return affected
+
+    def _update_legal_moves(self, points: Iterable[tuple[int, int]]) -> None:
+        """Recheck whether each colour may place a stone at every one of the given points"""
+        size = self.board.size
+        for color, legal in self._legal_moves.items():
+            for x, y in points:
+                if self.board.is_valid_move(x, y, color):
+                    legal.add(x * size + y)
+                else:
+                    legal.discard(x * size + y)
+
+    def position_key(self) -> int:
+        """Return a hash identifying the current position: the stones on the board and the player to move"""
+        if self.current_player == "White":
+            return self.board.zobrist_hash ^ WHITE_TO_MOVE_KEY
+        else:
+            return self.board.zobrist_hash
+
+    def setup_key(self) -> tuple[int, int, tuple[tuple[str, int, int], ...]]:
+        """Return the (board size, handicap, setup stones) of this game, which identify the starting position
+        of the game. Games with different setup keys are stored in different game trees.
+
+        >>> Game().setup_key()
+        (9, 0, ())
+        """
+        return self.board_size, self.handicap, tuple(sorted(self.setup_stones))
+
     def add_sequence(self, moves_sequence: list[tuple[int, int]]) -> None:
         """Function for testing the ouputting of a final board state
         Given a move sequence, it adds each move to the board
@@ -129,24 +298,53 @@ class Game:
         return new_moves
 
     def available_moves(self) -> list[tuple[int, int]]:
-        """Return a list of the moves that are available to be played
+        """Return a list of the moves that are available to be played, ordered by x and then y
 
-        Uses the check valid moves function under the board class
+        Uses the legal moves of the current player, which are kept up to date with the check valid moves
+        function under the board class, and excludes moves that would repeat an earlier position
         """
         available_moves = []
-        for x in range(self.board.size):
-            for y in range(self.board.size):
-                # notice that it uses the board to check valid moves
-                if self.board.is_valid_move(x, y, self.current_player):
-                    available_moves.append((x, y))
+        for index in sorted(self._legal_moves[self.current_player]):
+            x, y = divmod(index, self.board.size)
+            if not self.repeats_position(x, y):
+                available_moves.append((x, y))
         return available_moves
 
+    def random_move(self, rng: random.Random | ModuleType = random,
+                    avoid_eyes: bool = True) -> Optional[tuple[int, int]]:
+        """Return one of the available moves chosen uniformly at random with the given random number generator,
+        or None if there is no available move.
+
+        If avoid_eyes is True, points whose neighbours are all stones of the current player (its own eyes) are
+        never chosen, as random playouts would otherwise fill in their own eyes and never end.
+        """
+        size = self.board.size
+        neighbours = point_neighbours(size)
+        candidates = list(self._legal_moves[self.current_player])
+        while candidates:
+            i = rng.randrange(len(candidates))
+            index = candidates[i]
+            candidates[i] = candidates[-1]
+            candidates.pop()
+            x, y = divmod(index, size)
+            if avoid_eyes and all(self.board.get_color(*divmod(neighbour, size)) == self.current_player
+                                  for neighbour in neighbours[index]):
+                continue
+            elif not self.repeats_position(x, y):
+                return x, y
+        return None
+
+    def has_available_moves(self) -> bool:
+        """Return whether any move is available to be played, without listing all of them"""
+        size = self.board.size
+        return any(not self.repeats_position(*divmod(index, size)) for index in self._legal_moves[self.current_player])
+
     def is_game_over(self) -> bool:
         """Checks if the game is over if both players have passed their turns it returns True,
         otherwise False add a check for if the board is full and check its fucntionality
         """
 
-        if self.played_moves()[-1] == (-1, -1) and len(self.moves) >= 2 and self.played_moves()[-1] == (-1, -1):
+        if len(self.moves) >= 2 and self.moves[-1][1:] == (-1, -1) and self.moves[-2][1:] == (-1, -1):
             return True
         else:
             return False
@@ -157,6 +355,7 @@ class Game:
 
     def pass_turn(self) -> None:
         """Allows a player to pass their turn."""
+        self._undo_stack.append((-1, -1, [], [], self.black_captured, self.white_captured, self.current_player, False))
         self.current_player = "White" if self.current_player == "Black" else "Black"
         self.moves.append((self.last_turn_num() + 1, -1, -1))
 
@@ -169,11 +368,24 @@ class Game:
         """
         if len(self.moves) == max_moves:
             return True
-        elif not self.available_moves():
+        elif not self.has_available_moves():
             return True
         else:
             return False
 
+    def territory(self, technique: str = "dfs") -> list[list[tuple[int, int]]]:
+        """
+        Returns the territory of black and white on the current board, as computed by board.calculate_score.
+        The result is remembered until the board changes, so it must not be mutated.
+
+        Preconditions:
+            - technique is a valid technique
+        """
+        key = (self.board.zobrist_hash, technique)
+        if key not in self._territory_cache:
+            self._territory_cache[key] = self.board.calculate_score(technique)
+        return self._territory_cache[key]
+
     def overall_score(self, technique: str = "dfs") -> tuple[float, float]:
         """
         Returns the overall score of the game
@@ -181,9 +393,9 @@ class Game:
         Preconditions:
             - technique is a valid technique
         """
-        total_white, total_black = 2.5, 0
+        total_white, total_black = KOMI, 0
 
-        territory_score = self.board.calculate_score(technique)
+        territory_score = self.territory(technique)
 
         total_black += len(territory_score[0]) + self.black_captured
 
@@ -197,7 +409,8 @@ class Game:
         Preconditions:
             - player in {'White', 'Black'}
         """
-        if self.overall_score()[0] > self.overall_score()[1]:
+        white_score, black_score = self.overall_score()
+        if white_score > black_score:
             return player == "White"
         else:
             return player == "Black"
@@ -209,9 +422,10 @@ class Game:
     def get_move_info(self, x: int, y: int) -> tuple[int, str]:
         """Returns the turn number and player color based on the given coordinates
         """
+        second_player = "White" if self.first_player == "Black" else "Black"
         for turn, move_x, move_y in self.moves:
             if move_x == x and move_y == y:
-                player_color = "Black" if turn % 2 == 1 else "White"
+                player_color = self.first_player if turn % 2 == 1 else second_player
                 return turn, player_color
         return -1, "Neither"
 
@@ -226,6 +440,8 @@ class Game:
             - color in {'White', 'Black'}
         """
         self.board.add_stone(x, y, color)
+        self._update_legal_moves(self._affected_points([(x, y)]))
+        self._territory_cache.clear()
 
 # if __name__ == "__main__":
 #     game = Game()
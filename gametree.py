@@ -18,29 +18,59 @@ See README file for instructions, project details, and the relevant copyright an
 """
 
 from __future__ import annotations
-from typing import Optional
-from game import Game
+from typing import Collection, Optional
+from game import Game, handicap_first_player
+from symmetry import canonicalise_sequence
 
 GAME_START_MOVE = (0, -1, -1)
 PASS_MOVE = (-1, -1, -1)
 
 
+def encode_move(move: tuple[int, int, int]) -> int:
+    """Pack the given (move number, x, y) move into a single integer
+
+    >>> decode_move(encode_move((12, 3, -1)))
+    (12, 3, -1)
+
+    Preconditions:
+        - move[0] >= -1
+        - -1 <= move[1] < 255 and -1 <= move[2] < 255
+    """
+    return ((move[0] + 1) << 16) | ((move[1] + 1) << 8) | (move[2] + 1)
+
+
+def decode_move(code: int) -> tuple[int, int, int]:
+    """Return the (move number, x, y) move packed into the given integer by encode_move"""
+    return (code >> 16) - 1, ((code >> 8) & 0xFF) - 1, (code & 0xFF) - 1
+
+
 class GameTree:
     """A decision tree that stores possible move variations and their resulting win_probability
 
     Each node in the tree stores a GO move.
 
+    The nodes are kept compact, since a tree built from a whole data set has millions of them: they use
+    __slots__ instead of an instance dictionary, store their move packed into a single integer, keep their
+    subtrees in a plain list which is only created for the first subtree, and derive win_probability from
+    their visit count and value sum instead of storing it.
+
     Instance Attributes:
         - move: the current move (spot on the board), or (0, -1, -1) if this tree represents the start of a game
-        - _subtrees: the dictionary of the subtrees of the game trees, with keys corresponding to the moves
+        - _subtrees: the list of the subtrees of the game tree, or None if there are no subtrees yet
         - win_probability: the probability of winning relative to black  (backpropagation)
+        - visits: the number of inserted sequences which pass through this node
+        - value_sum: the sum of the probabilities of the inserted sequences which pass through this node,
+                     or the win_probability given to the initializer while there are no visits
     Representation Invariants:
         - self.move[0]>=-1 and self.move[1]>=-1 and self.move[2]>=-1
-        - all(self._subtrees[subtree].move==subtree for subtree in self._subtrees)
+        - len({subtree.move for subtree in self.get_subtrees()}) == len(self.get_subtrees())
+        - self.visits == 0 or self.win_probability == self.value_sum / self.visits
     """
-    move: tuple[int, int, int]
-    _subtrees: dict[tuple[int, int, int], GameTree]
-    win_probability: float
+    __slots__ = ('_move_code', '_subtrees', 'visits', 'value_sum')
+    _move_code: int
+    _subtrees: Optional[list[GameTree]]
+    visits: int
+    value_sum: float
 
     def __init__(self, move: tuple[int, int, int] = GAME_START_MOVE,
                  win_probability: float = 0.0) -> None:
@@ -52,23 +82,65 @@ class GameTree:
         >>> game.move == GAME_START_MOVE
         True
         """
-        self.move = move
-        self._subtrees = {}
-        self.win_probability = win_probability
+        self._move_code = encode_move(move)
+        self._subtrees = None
+        self.visits = 0
+        self.value_sum = win_probability
+
+    @property
+    def move(self) -> tuple[int, int, int]:
+        """The move represented by this node"""
+        return decode_move(self._move_code)
+
+    @property
+    def win_probability(self) -> float:
+        """The average probability of the sequences through this node"""
+        if self.visits == 0:
+            return self.value_sum
+        return self.value_sum / self.visits
+
+    @win_probability.setter
+    def win_probability(self, probability: float) -> None:
+        """Set the average probability of this node, keeping its visit count"""
+        self.value_sum = probability * self.visits if self.visits > 0 else probability
+
+    def __setstate__(self, state: tuple[Optional[dict], dict] | dict) -> None:
+        """Restore this tree when it is unpickled.
+
+        Trees pickled before GameTree used __slots__ (such as the pre-generated trees of the README) have the
+        instance dictionary {'move', '_subtrees', 'win_probability'} as their state, with their subtrees in a
+        dictionary keyed by move. They are converted to the current form, counting their win probability as a
+        single visit, so that the results inserted later are blended with it instead of replacing it.
+        """
+        if isinstance(state, tuple):
+            instance_dict, slots = state
+            state = {**(instance_dict or {}), **slots}
+        if 'move' in state:
+            self._move_code = encode_move(state['move'])
+            self._subtrees = list(state['_subtrees'].values()) or None
+            self.visits = 1
+            self.value_sum = state['win_probability']
+        else:
+            for name, value in state.items():
+                setattr(self, name, value)
 
     def get_subtrees(self) -> list[GameTree]:
         """Return the subtrees of this game tree."""
-        return list(self._subtrees.values())
+        if self._subtrees is None:
+            return []
+        return list(self._subtrees)
 
     def find_subtree_by_move(self, move: tuple[int, int, int]) -> Optional[GameTree]:
         """Return the subtree corresponding to the given move.
 
         Return None if no subtree corresponds to that move.
         """
-        if move in self._subtrees:
-            return self._subtrees[move]
-        else:
-            return None
+        if self._subtrees is not None:
+            move_code = encode_move(move)
+            for subtree in self._subtrees:
+                if subtree._move_code == move_code:
+                    return subtree
+        return None
 
     def is_black_turn(self) -> bool:
         """Return whether the CURRENT move should was made by black."""
@@ -76,9 +148,16 @@ class GameTree:
 
     def __len__(self) -> int:
         """Return the number of items in this tree."""
-        # Note: no "empty tree" base case is necessary here.
-        # Instead, the only implicit base case is when there are no subtrees (sum returns 0).
-        return 1 + sum(subtree.__len__() for subtree in self._subtrees.values())
+        # counted with a stack rather than by recursion, since the trees of long games are deeper than the
+        # recursion limit
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if node._subtrees is not None:
+                stack.extend(node._subtrees)
+        return count
 
     def __str__(self) -> str:
         """Return a string representation of this tree.
@@ -106,59 +185,291 @@ class GameTree:
             turn_desc = "White's move:"
         move_desc = f'{turn_desc} {self.move} ({self.win_probability})\n'
         str_so_far = '  ' * depth + move_desc
-        for subtree in self._subtrees.values():
+        for subtree in self.get_subtrees():
             str_so_far += subtree._str_indented(depth + 1)
         return str_so_far
 
     def add_subtree(self, subtree: GameTree) -> None:
         """Add a subtree to this game tree."""
-        self._subtrees[subtree.move] = subtree
+        if self._subtrees is None:
+            self._subtrees = [subtree]
+        else:
+            self._subtrees.append(subtree)
+
+    def insert_move_sequence(self, moves: list[tuple[int, int, int]], probability: float,
+                             canonical: bool = False, board_size: int = 9,
+                             setup_stones: Collection[tuple[str, int, int]] = ()) -> None:
+        """Insert the given move sequence with this tree as the parent
 
-    def insert_move_sequence(self, moves: list[tuple[int, int, int]], probability: float) -> None:
-        """Insert the given move sequence with this tree as the parent"""
+        If canonical is True, the sequence is first mapped onto its canonical orientation (see the symmetry
+        module), so that all 8 rotations and reflections of a game are stored as the same sequence. The
+        orientation must then also leave the setup stones of the game (e.g. handicap stones) unchanged.
+
+        Only the nodes along the sequence are updated, each counting one more visit with the given probability,
+        so inserting a sequence takes time proportional to its length rather than to the size of the tree.
+        """
         #: potentially add the proability to the parameters
-        self._insert_move_sequence_helper(moves, 0, probability)
-        self.update_win_probability()
-
-    def _insert_move_sequence_helper(self, moves: list[tuple[int, int, int]], current_index: int,
-                                     probability: float) -> None:
-        """helps, hopefully - helper function for insert_move_sequence"""
-        #  add parents to trees
-        if current_index == len(moves):
-            self.win_probability = probability
-            return
-        elif moves[current_index] not in self._subtrees:
-            self.add_subtree(GameTree(moves[current_index], probability))  # added parent here
-        self._subtrees[moves[current_index]]._insert_move_sequence_helper(moves, current_index + 1, probability)
+        if canonical:
+            moves = canonicalise_sequence(moves, board_size, setup_stones)[0]
+        for node in self._insert_path(moves, probability):
+            node.add_result(probability)
+
+    def insert_move_sequences(self, sequences: list[tuple[list[tuple[int, int, int]], float]],
+                              canonical: bool = False, board_size: int = 9,
+                              setup_stones: Collection[tuple[str, int, int]] = ()) -> int:
+        """Insert every (move sequence, probability) pair of the given list with this tree as the parent, and
+        return the number of sequences which were not inserted (always 0, as the moves are not checked)
+
+        This is the bulk version of insert_move_sequence: the results are only recorded at the end of each
+        sequence while inserting, and are then added to every node above them in a single post-order pass.
+        """
+        ends = {}
+        for moves, probability in sequences:
+            if canonical:
+                moves = canonicalise_sequence(moves, board_size, setup_stones)[0]
+            end = self._insert_path(moves, probability)[-1]
+            visits, value = ends.get(id(end), (0, 0.0))
+            ends[id(end)] = (visits + 1, value + probability)
+        self._aggregate_results(ends)
+        return 0
+
+    def _insert_path(self, moves: list[tuple[int, int, int]], probability: float) -> list[GameTree]:
+        """Return the nodes along the given sequence, starting with this tree, adding the missing ones
+        with the given probability"""
+        node = self
+        path = [node]
+        for move in moves:
+            child = node.find_subtree_by_move(move)
+            if child is None:
+                child = GameTree(move, probability)
+                node.add_subtree(child)  # added parent here
+            node = child
+            path.append(node)
+        return path
+
+    def _aggregate_results(self, ends: dict[int, tuple[int, float]]) -> None:
+        """Add the (visits, value) results recorded in ends, keyed by the id of the node at which they ended,
+        to that node and to every node above it. This is done in a single post-order pass over this tree."""
+        added = {}
+        stack = [(self, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((subtree, False) for subtree in node.get_subtrees())
+            else:
+                visits, value = ends.get(id(node), (0, 0.0))
+                for subtree in node.get_subtrees():
+                    subtree_visits, subtree_value = added.pop(id(subtree))
+                    visits, value = visits + subtree_visits, value + subtree_value
+                if visits > 0:
+                    node.add_result(value, visits)
+                added[id(node)] = (visits, value)
+
+    def add_result(self, value: float, visits: int = 1) -> None:
+        """Record that the given number of visits, with the given total probability, passed through this node"""
+        if self.visits == 0:
+            self.value_sum = 0.0
+        self.visits += visits
+        self.value_sum += value
 
     def update_win_probability(self) -> None:
-        """updates the probability of 1 branch use this method after it creates after 1 complete game is added."""
+        """updates the probability of 1 branch use this method after it creates after 1 complete game is added.
+
+        NOTE: this recomputes every win_probability as the plain average of its subtrees, which is no longer
+        what insert_move_sequence maintains (the average over every sequence through the node)."""
         if not self._subtrees:
             return
         else:
-            for subtree in self._subtrees.values():
+            for subtree in self.get_subtrees():
                 subtree.update_win_probability()
         probabilities = [subtree.win_probability for subtree in self.get_subtrees()]
         self.win_probability = sum(probabilities) / len(probabilities)
 
-    def insert_game_into_tree(self, game: Game) -> None:
+    def insert_game_into_tree(self, game: Game, canonical: bool = False) -> None:
         """Insert a game into a tree as a sequence,
         with the leaf probability of territory score at the end of the game.
         """
         #  fix the output of calculate_score and adjust this method accordingly
-        victory_score = game.overall_score()[1] - game.overall_score()[0]
-        self.insert_move_sequence(game.moves, victory_score)
+        white_score, black_score = game.overall_score()
+        victory_score = black_score - white_score
+        self.insert_move_sequence(game.moves, victory_score, canonical, game.board_size, game.setup_stones)
 
-    def insert_game_into_tree_absolute(self, game: Game) -> None:
+    def insert_game_into_tree_absolute(self, game: Game, canonical: bool = False) -> None:
         """Insert a game into a tree as a sequence,
         with the leaf probability of territory score at the end of the game.
         """
         #  fix the output of calculate_score and adjust this method accordingly
-        if game.overall_score()[1] - game.overall_score()[0] > 0:
+        white_score, black_score = game.overall_score()
+        if black_score - white_score > 0:
             victory_score = 1
         else:
             victory_score = 0
-        self.insert_move_sequence(game.moves, victory_score)
+        self.insert_move_sequence(game.moves, victory_score, canonical, game.board_size, game.setup_stones)
+
+
+class TranspositionGameTree(GameTree):
+    """A game tree in which every board position is stored only once
+
+    Move sequences which reach the same position in a different order (transpositions) share a single node,
+    so that node and its win_probability combine the results of all of those sequences. The nodes therefore
+    form a directed graph rather than a strict tree, and a node may be the subtree of several parents.
+
+    Instance Attributes:
+        - position_key: the Game.position_key() of the position represented by this node
+        - setup: the Game.setup_key() of the games in this tree: the size of the board the positions are played on,
+                 the handicap, and the stones placed on the board before the first move
+        - _table: the dictionary of every node reachable from the root, keyed by position_key. It is shared
+                  by all the nodes of the tree.
+    Representation Invariants:
+        - self._table[self.position_key] is self
+        - all(self._table[subtree.position_key] is subtree for subtree in self.get_subtrees())
+    """
+    __slots__ = ('position_key', 'setup', '_table')
+    position_key: int
+    setup: tuple[int, int, tuple[tuple[str, int, int], ...]]
+    _table: dict[int, TranspositionGameTree]
+
+    def __init__(self, move: tuple[int, int, int] = GAME_START_MOVE, win_probability: float = 0.0,
+                 position_key: Optional[int] = None, board_size: int = 9,
+                 table: Optional[dict[int, TranspositionGameTree]] = None, handicap: int = 0,
+                 setup_stones: Collection[tuple[str, int, int]] = ()) -> None:
+        """Initialize a new transposition game tree.
+
+        When no table is given, this node becomes the root of a new tree representing the board with only
+        the given setup stones on it.
+
+        >>> tree = TranspositionGameTree()
+        >>> tree.find_subtree_by_position(Game().position_key()) is tree
+        True
+        """
+        GameTree.__init__(self, move, win_probability)
+        self.setup = (board_size, handicap, tuple(sorted(setup_stones)))
+        if position_key is None:
+            position_key = self.new_game().position_key()
+        self.position_key = position_key
+        if table is None:
+            table = {}
+        self._table = table
+        self._table[position_key] = self
+
+    @property
+    def board_size(self) -> int:
+        """The size of the board the positions are played on"""
+        return self.setup[0]
+
+    def new_game(self) -> Game:
+        """Return a new game at the starting position of this tree"""
+        board_size, handicap, setup_stones = self.setup
+        return Game(player_turn=handicap_first_player(handicap),
+                    size=board_size, setup_stones=list(setup_stones), handicap=handicap)
+
+    def find_subtree_by_position(self, position_key: int) -> Optional[TranspositionGameTree]:
+        """Return the node of this tree representing the position with the given key,
+        no matter which sequence of moves leads to it.
+
+        Return None if the position does not appear in this tree.
+        """
+        return self._table.get(position_key)
+
+    def __len__(self) -> int:
+        """Return the number of distinct positions reachable from this node, including itself."""
+        seen = {id(self)}
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for subtree in node.get_subtrees():
+                if id(subtree) not in seen:
+                    seen.add(id(subtree))
+                    stack.append(subtree)
+        return len(seen)
+
+    def find_subtree_by_move(self, move: tuple[int, int, int]) -> Optional[TranspositionGameTree]:
+        """Return the subtree corresponding to the given move.
+
+        Only the coordinates of the move are compared, since a shared subtree may have been reached with a
+        different move number along another sequence.
+        Return None if no subtree corresponds to that move.
+        """
+        if self._subtrees is not None:
+            point_code = encode_move(move) & 0xFFFF
+            for subtree in self._subtrees:
+                if subtree._move_code & 0xFFFF == point_code:
+                    return subtree
+        return None
+
+    def insert_move_sequence(self, moves: list[tuple[int, int, int]], probability: float,
+                             canonical: bool = False, board_size: int = 9,
+                             setup_stones: Collection[tuple[str, int, int]] = ()) -> bool:
+        """Insert the given move sequence with this tree as the parent, and return whether it was inserted
+
+        The given board_size and setup_stones are ignored, as the tree already records its setup.
+
+        The moves are replayed on a board to identify each position, and a position which is already in the
+        tree is reused instead of being added again. A sequence with a move which is not legal is not inserted
+        at all, so that its result is not counted for the positions before that move.
+
+        Preconditions:
+            - self is the root of the tree (the starting position)
+        """
+        board_size, _, setup_stones = self.setup
+        if canonical:
+            moves = canonicalise_sequence(moves, board_size, setup_stones)[0]
+        game = self.new_game()
+        position_keys = []
+        for move in moves:
+            if move[1:] == (-1, -1):
+                game.pass_turn()
+            elif not game.play_move(move[1], move[2]):
+                return False
+            position_keys.append(game.position_key())
+
+        node = self
+        path = {self.position_key: self}
+        for move, key in zip(moves, position_keys):
+            child = node.find_subtree_by_move(move)
+            if child is None:
+                child = self._table.get(key)
+                if child is None:
+                    child = TranspositionGameTree(move, probability, key, table=self._table)
+                    child.setup = self.setup
+                node.add_subtree(child)
+            node = child
+            path[node.position_key] = node
+
+        # a position repeated by passing is only counted once
+        for node in path.values():
+            node.add_result(probability)
+        return True
+
+    def insert_move_sequences(self, sequences: list[tuple[list[tuple[int, int, int]], float]],
+                              canonical: bool = False, board_size: int = 9,
+                              setup_stones: Collection[tuple[str, int, int]] = ()) -> int:
+        """Insert every (move sequence, probability) pair of the given list with this tree as the parent, and
+        return the number of sequences which were not inserted because they have a move which is not legal
+
+        Since a node may have several parents, the results cannot be added up in a single pass over the
+        tree, so each sequence is inserted with insert_move_sequence instead.
+        """
+        return sum(not self.insert_move_sequence(moves, probability, canonical) for moves, probability in sequences)
+
+    def update_win_probability(self) -> None:
+        """updates the probability of every node reachable from this one.
+
+        A node shared by several parents is only updated once.
+        """
+        self._update_win_probability_helper(set())
+
+    def _update_win_probability_helper(self, visited: set[int]) -> None:
+        """helper function for update_win_probability, visited contains the keys of the nodes already updated"""
+        visited.add(self.position_key)
+        if not self._subtrees:
+            return
+        for subtree in self.get_subtrees():
+            if subtree.position_key not in visited:
+                subtree._update_win_probability_helper(visited)
+        probabilities = [subtree.win_probability for subtree in self.get_subtrees()]
+        self.win_probability = sum(probabilities) / len(probabilities)
 
 
 if __name__ == '__main__':
@@ -18,25 +18,126 @@ See README file for instructions, project details, and the relevant copyright an
 """
 
 import sys
-import pygame
+import math
+import threading
+from multiprocessing import Pool
 from game import Game
-from gametree import GameTree
+from gametree import GameTree, TranspositionGameTree
+from tree_file import MappedGameTree
+from symmetry import canonical_symmetries, transform_move, transformed_position_key, SYMMETRIES, \
+    INVERSE_SYMMETRIES
 import random
-from pygame_go import draw_board, return_row_col
 from typing import Optional
+from mcts import SearchNode, PASS_MOVE, run_search, budget, root_parallel_search, leaf_simulator
+from sgf_reader import DEFAULT_WIN_MARGIN
 
 
 class GoPlayer:
     """An abstract class representing different algorithms to play Go
 
     Instance Attributes:
-        - gt: the gametree which the player uses
+        - gt: the node of the gametree for the current position, or None if the game has left the tree
+        - canonical: whether the moves in gt are stored in their canonical orientation (see the symmetry module)
     """
     gt: Optional[GameTree]
+    canonical: bool
 
-    def __init__(self, gt: GameTree) -> None:
+    def __init__(self, gt: GameTree, canonical: bool = False) -> None:
         """initialise this go player with the given game tree"""
         self.gt = gt
+        self.canonical = canonical
+        self._symmetry_override = None
+        # the root of the tree, so that the player can return to the tree after the game left it
+        self._book_root = gt
+        # the number of moves of the game when the player last looked at it, to notice when a new game starts
+        self._moves_seen = 0
+
+    def _tree_symmetry(self, game: Game) -> int:
+        """Return the symmetry which maps the moves of the given game onto the orientation used by the tree"""
+        if not self.canonical:
+            return 0
+        elif self._symmetry_override is not None:
+            return self._symmetry_override
+        else:
+            return canonical_symmetries(game.moves, game.board_size, game.setup_stones)[0]
+
+    def _to_tree_move(self, game: Game, move: tuple[int, int, int]) -> tuple[int, int, int]:
+        """Return the given move of the game as it is stored in the tree"""
+        return transform_move(move, self._tree_symmetry(game), game.board_size)
+
+    def _from_tree_move(self, game: Game, move: tuple[int, int, int]) -> tuple[int, int]:
+        """Return the (x, y) coordinates on the board of the game of the given move from the tree"""
+        symmetry = INVERSE_SYMMETRIES[self._tree_symmetry(game)]
+        return transform_move(move, symmetry, game.board_size)[1:]
+
+    def _find_position(self, game: Game) -> Optional[GameTree]:
+        """Return the node of the tree representing the current position of the game, in any orientation if the
+        tree is canonical. Return None if the position is not in the tree.
+
+        A TranspositionGameTree is searched by position key, so the position may have been reached by any
+        move order. In any other tree, the moves of the game are followed from the root.
+        """
+        if self._book_root is None:
+            return None
+        elif not isinstance(self._book_root, (TranspositionGameTree, MappedGameTree)):
+            node = self._book_root
+            symmetry = self._tree_symmetry(game)
+            for move in game.moves:
+                node = node.find_subtree_by_move(transform_move(move, symmetry, game.board_size))
+                if node is None:
+                    return None
+            return node
+        elif not self.canonical:
+            return self._book_root.find_subtree_by_position(game.position_key())
+        for symmetry in SYMMETRIES:
+            node = self._book_root.find_subtree_by_position(transformed_position_key(game, symmetry))
+            if node is not None:
+                self._symmetry_override = symmetry
+                return node
+        return None
+
+    def _follow_book(self, game: Game) -> None:
+        """Advance gt to the node for the last move of the game (the opponent's move). If it has no such child,
+        or if the game had already left the tree, look up the current position from the root of the tree instead,
+        so that the player returns to the tree whenever the game transposes back into it.
+        Set gt to None if the current position is not in the tree, and back to the root for a new game.
+
+        The same player may play several games in a row, as either colour:
+
+        >>> tree = TranspositionGameTree()
+        >>> tree.insert_move_sequences([([(1, 2, 2), (2, 6, 6)], 1.0), ([(1, 6, 6), (2, 2, 2)], 0.0)])
+        0
+        >>> white = FullyRandom(tree)
+        >>> first_game = Game()
+        >>> first_game.play_move(2, 2)
+        True
+        >>> white._follow_book(first_game)
+        >>> second_game = Game()
+        >>> second_game.play_move(6, 6)
+        True
+        >>> white._follow_book(second_game)
+        >>> white.gt.win_probability
+        0.0
+        """
+        self._check_new_game(game)
+        subtree = self._book_root if not game.moves else None
+        if game.moves and self.gt is not None:
+            subtree = self.gt.find_subtree_by_move(self._to_tree_move(game, game.moves[-1]))
+        if subtree is None:
+            subtree = self._find_position(game)
+        self.gt = subtree
+
+    def _check_new_game(self, game: Game) -> None:
+        """Call _new_game if the given game is not the game the player last looked at: it has fewer moves than
+        that game had, or it is at its first move (as black or white) after the player has seen other moves"""
+        if len(game.moves) < self._moves_seen or (len(game.moves) <= 1 and self._moves_seen > 0):
+            self._new_game()
+        self._moves_seen = len(game.moves)
+
+    def _new_game(self) -> None:
+        """Forget the state kept from the previous game, and return to the root of the tree"""
+        self._symmetry_override = None
+        self.gt = self._book_root
 
     def make_move(self, game) -> tuple[int, int]:
         """This function will determine how the algorithm chooses the
@@ -44,6 +145,16 @@ class GoPlayer:
         """
         raise NotImplementedError
 
+    def ponder(self, game: Game) -> None:
+        """Start thinking about the given game in the background while the opponent chooses its move.
+        Players which do not search do nothing."""
+
+    def stop_pondering(self) -> None:
+        """Stop thinking in the background, and wait until the player has stopped"""
+
+    def close(self) -> None:
+        """Release the resources held by this player, such as worker processes. Players without any do nothing."""
+
 
 class FullyRandom(GoPlayer):
     """A Go player that plays randomly by choosing its next move completely randomly
@@ -73,6 +184,10 @@ class UserGoPlayer(GoPlayer):
 
     def make_move(self, game) -> tuple[int, int]:
         """makes move based on where the user clicks """
+        # imported here so that the other players can be used without a display
+        import pygame
+        from pygame_go import draw_board, return_row_col
+
         new_game = game
 
         while True:
@@ -100,7 +215,7 @@ class UserGoPlayer(GoPlayer):
                     else:
                         color = "White"
 
-                    if 0 <= row < 9 and 0 <= col < 9 and (row, col) and new_game.board.is_valid_move(row, col, color):
+                    if new_game.board.is_valid_coord(row, col) and new_game.board.is_valid_move(row, col, color):
                         print((len(new_game.moves) + 1, row, col))
                         print("coordinates: ", row, col)
                         return (row, col)
@@ -129,9 +244,8 @@ class BetterRandomGoPlayer(GoPlayer):
 
             last_move = game.get_move_info(move_sequence[-1][1], move_sequence[-1][2])
 
-            check_stone = game.board.get_stone(move_sequence[-1][1], move_sequence[-1][2])
-            choices = [(check_stone.x + 1, check_stone.y), (check_stone.x - 1, check_stone.y),
-                       (check_stone.x, check_stone.y + 1), (check_stone.x, check_stone.y - 1)]
+            last_x, last_y = move_sequence[-1][1], move_sequence[-1][2]
+            choices = [(last_x + 1, last_y), (last_x - 1, last_y), (last_x, last_y + 1), (last_x, last_y - 1)]
 
             if not any(game.board.is_valid_move(choice[0], choice[1], last_move[1]) for choice in choices):
 
@@ -156,15 +270,15 @@ class BetterRandomGoPlayer(GoPlayer):
 
             return (coord[0], coord[1])
         else:
-            return (random.randint(0, 8), random.randint(0, 8))
+            return (random.randint(0, game.board.size - 1), random.randint(0, game.board.size - 1))
 
 
 class SlightlyBetterBlackPlayer(GoPlayer):
     """A Go AI that makes the best move given in its subtree."""
 
-    def __init__(self, gt: GameTree) -> None:
+    def __init__(self, gt: GameTree, canonical: bool = False) -> None:
         """Initialize this GoPlayer"""
-        GoPlayer.__init__(self, gt)
+        GoPlayer.__init__(self, gt, canonical)
 
     def make_move(self, game: Game) -> tuple:
         """This function determines how the next move should be made. It
@@ -173,18 +287,10 @@ class SlightlyBetterBlackPlayer(GoPlayer):
         notes: this DOES NOT update the move sequence
         since the AI updates the tree twice, when 2 AIs go against each other, they should not share a tree
 
-        Does not work as of now
+        Once the game leaves the tree, the player returns to it if the game reaches a position of the tree again.
         """
-        if self.gt is not None:
-            if game.moves:
-                last_move = game.moves[-1]
-            else:
-                return (random.randint(0, 8), random.randint(0, 8))
-            if self.gt.find_subtree_by_move(last_move) is None:
-                self.gt = None  # update the subtree from previous move
-            else:
-                self.gt = self.gt.find_subtree_by_move(last_move)
-        if self.gt is None or self.gt.get_subtrees() == [] or (game.moves[-1] not in self.gt.get_subtrees()):
+        self._follow_book(game)  # update the subtree from previous move
+        if self.gt is None or self.gt.get_subtrees() == []:
             self.gt = None
 
             move_sequence = game.moves
@@ -192,9 +298,8 @@ class SlightlyBetterBlackPlayer(GoPlayer):
 
                 last_move = game.get_move_info(move_sequence[-1][1], move_sequence[-1][2])
 
-                check_stone = game.board.get_stone(move_sequence[-1][1], move_sequence[-1][2])
-                choices = [(check_stone.x + 1, check_stone.y), (check_stone.x - 1, check_stone.y),
-                           (check_stone.x, check_stone.y + 1), (check_stone.x, check_stone.y - 1)]
+                last_x, last_y = move_sequence[-1][1], move_sequence[-1][2]
+                choices = [(last_x + 1, last_y), (last_x - 1, last_y), (last_x, last_y + 1), (last_x, last_y - 1)]
 
                 if not any(game.board.is_valid_move(choice[0], choice[1], last_move[1]) for choice in choices):
                     valid_moves = game.available_moves()
@@ -228,30 +333,28 @@ class SlightlyBetterBlackPlayer(GoPlayer):
                     max_win_prob = subtree.win_probability
                     best_choice = subtree
             self.gt = best_choice  # updates GameTree to be a subtree with the best choice
-            return (best_choice.move[1], best_choice.move[2])  # will not be referenced before
+            return self._from_tree_move(game, best_choice.move)  # will not be referenced before
 
 
 class ProbabilityBaseGoplayer(GoPlayer):
     """A Go AI that makes the best move given in its subtree and its score probability."""
 
-    def __init__(self, gt: GameTree) -> None:
+    def __init__(self, gt: GameTree, canonical: bool = False) -> None:
         """Initialize this GoPlayer"""
-        GoPlayer.__init__(self, gt)
+        GoPlayer.__init__(self, gt, canonical)
 
     def make_move(self, game: Game) -> tuple[int, int]:
         """ This function determines how the next move should be made.
         It moves forward to the last move on the tree, then chooses a move based on the probability of that move,
-        and follows the tree to make a random move."""
+        and follows the tree to make a random move.
+
+        If the tree is a TranspositionGameTree, a position reached by an unexpected move order is looked up by its
+        position key instead, also after the game has left the tree, so that the player returns to the tree
+        whenever the game reaches one of its positions again.
+        If the player is canonical, moves are mapped to and from the orientation of the tree."""
 
         # Reassign the tree
-        if not game.get_move_sequence():  # First Move
-            pass
-        elif not self.gt or len(self.gt.get_subtrees()) == 0:
-            self.gt = None
-        else:
-            adversary_move = game.get_move_sequence()[-1]
-            new_subtree = self.gt.find_subtree_by_move(adversary_move)
-            self.gt = new_subtree
+        self._follow_book(game)
 
         if not self.gt or len(self.gt.get_subtrees()) == 0:
             possible_moves = game.available_moves()
@@ -275,7 +378,207 @@ class ProbabilityBaseGoplayer(GoPlayer):
                 possible_moves = game.available_moves()
                 return random.choice(list(possible_moves))
 
-            return (self.gt.move[1], self.gt.move[2])
+            return self._from_tree_move(game, highest_move)
+
+
+class MCTSPlayer(GoPlayer):
+    """A Go AI that chooses its moves with a Monte Carlo Tree Search (see the mcts module), which plays
+    stronger the more playouts it is given.
+
+    While the game is still in its game tree (the opening book), the statistics of the tree are used as
+    priors: every searched move found in the tree starts with up to prior_weight playouts won in the
+    proportion given by its win_probability.
+
+    The search tree is kept between moves: the subtree for the move actually played by the opponent, found by
+    its position key, becomes the root of the next search along with all the statistics gathered for it.
+    If pondering is True, the player also keeps searching that tree in a background thread while the opponent
+    chooses its move (see ponder), so the reused subtree already has statistics when its turn starts.
+
+    With more than one process, the search is run in a pool of worker processes, which is created at the first
+    move and kept until close() is called. With root parallelism every worker searches its own tree and their root
+    statistics are added together; with leaf parallelism a single tree is searched, and every leaf is scored with
+    leaf_playouts playouts in each worker.
+
+    Instance Attributes:
+        - playouts: the number of playouts to run per move, or None to only use the time limit
+        - time_limit: the number of seconds to search per move, or None to only use the playout budget
+        - exploration: the exploration constant of the UCT formula
+        - prior_weight: the largest number of playouts a prior from the game tree counts for
+        - max_moves: the number of moves after which a playout is stopped and scored, or None for
+                     three times the number of points on the board
+        - processes: the number of worker processes to search with, or 1 to search in this process
+        - parallelism: how the search is shared out among the worker processes
+        - leaf_playouts: the number of playouts each worker runs from every leaf with leaf parallelism
+        - pondering: whether the player searches in the background during the opponent's turn
+
+    Representation Invariants:
+        - self.playouts is not None or self.time_limit is not None
+        - self.playouts is None or self.playouts >= 1
+        - self.exploration >= 0
+        - self.prior_weight >= 0
+        - self.processes >= 1
+        - self.parallelism in {'root', 'leaf'}
+        - self.leaf_playouts >= 1
+    """
+    playouts: Optional[int]
+    time_limit: Optional[float]
+    exploration: float
+    prior_weight: int
+    max_moves: Optional[int]
+    processes: int
+    parallelism: str
+    leaf_playouts: int
+    pondering: bool
+
+    def __init__(self, gt: Optional[GameTree] = None, canonical: bool = False, playouts: Optional[int] = 1000,
+                 time_limit: Optional[float] = None, exploration: float = 1.4, prior_weight: int = 10,
+                 max_moves: Optional[int] = None, seed: Optional[int] = None, processes: int = 1,
+                 parallelism: str = 'root', leaf_playouts: int = 1, pondering: bool = False) -> None:
+        """Initialize this GoPlayer, with an optional game tree to use as opening book
+
+        If both a playout budget and a time limit are given, the search stops at whichever comes first.
+        The seed makes the search reproducible for the same playout budget.
+        """
+        GoPlayer.__init__(self, gt, canonical)
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.prior_weight = prior_weight
+        self.max_moves = max_moves
+        self.processes = processes
+        self.parallelism = parallelism
+        self.leaf_playouts = leaf_playouts
+        self.pondering = pondering
+        self._rng = random.Random(seed)
+        # pondering draws from its own generator, so that it does not change the moves drawn by make_move
+        self._ponder_rng = random.Random(self._rng.getrandbits(64))
+        self._pool = None
+        # the node of the search tree for the position after this player's last move
+        self._search_root = None
+        self._ponder_thread = None
+        self._ponder_stop = threading.Event()
+
+    def make_move(self, game: Game) -> tuple[int, int]:
+        """This function determines how the next move should be made.
+        It searches the current position until the playout budget or time limit is used up, and plays the most
+        visited move. It passes, by returning (-1, -1), if there is nothing left to play."""
+        self.stop_pondering()
+        self._follow_book(game)
+        root = self.search(game)
+        if not root.children:
+            return PASS_MOVE
+        best_child = root.children[root.best_move()]
+        self.gt = best_child.book
+        self._search_root = best_child
+        return best_child.move
+
+    def search(self, game: Game) -> SearchNode:
+        """Search the current position of the given game, and return the root of the search tree
+
+        The game is not mutated.
+        """
+        max_moves = self.max_moves if self.max_moves is not None else 3 * game.board.size ** 2
+        if self.processes > 1 and self._pool is None:
+            self._pool = Pool(self.processes)
+
+        if self.processes > 1 and self.parallelism == 'root':
+            root = root_parallel_search(self._pool, self.processes, game, self._rng, self.playouts,
+                                        self.time_limit, self.exploration, max_moves)
+            root.book = self.gt
+            for child in root.children.values():
+                child_game = game.copy()
+                child_game.play_move(child.move[0], child.move[1])
+                self._expand(root, child_game, child)
+            return root
+
+        root = self._reused_root(game)
+        if root is None:
+            last_player = "White" if game.current_player == "Black" else "Black"
+            root = SearchNode(None, last_player, game.position_key())
+        root.book = self.gt
+        simulate = None
+        if self.processes > 1:
+            simulate = leaf_simulator(self._pool, self.processes, self.leaf_playouts, self._rng, max_moves)
+        run_search(root, game, budget(self.playouts, self.time_limit), self._rng, self.exploration, max_moves,
+                   self._expand, simulate)
+        return root
+
+    def _new_game(self) -> None:
+        """Forget the book position and the search tree kept from the previous game"""
+        GoPlayer._new_game(self)
+        self._search_root = None
+
+    def _reused_root(self, game: Game) -> Optional[SearchNode]:
+        """Return the node of the search tree kept from the last move of this player which represents the
+        current position of the game, matched by position key, or None if there is none"""
+        if self._search_root is None:
+            return None
+        position_key = game.position_key()
+        for child in self._search_root.children.values():
+            if child.position_key == position_key:
+                return child
+        return None
+
+    def _expand(self, parent: SearchNode, game: Game, child: SearchNode) -> None:
+        """Find the node of the game tree for the new child of the search tree, and add its win_probability
+        as prior to the child. The game is at the position of child."""
+        if parent.book is None:
+            return
+        child.book = parent.book.find_subtree_by_move(self._to_tree_move(game, game.moves[-1]))
+        if child.book is None or self.prior_weight == 0:
+            return
+        black_probability = child.book.win_probability
+        if not 0.0 <= black_probability <= 1.0:
+            # trees of score margins store by how much black won instead of a probability
+            black_probability = 1 / (1 + math.exp(-black_probability / DEFAULT_WIN_MARGIN))
+        probability = black_probability if child.player == "Black" else 1 - black_probability
+        prior_visits = min(getattr(child.book, 'visits', 0) or 1, self.prior_weight)
+        child.visits += prior_visits
+        child.wins += probability * prior_visits
+
+    def ponder(self, game: Game) -> None:
+        """Start searching the current position of the given game, in which it is the opponent's turn, in a
+        background thread, if pondering is True. The search runs in this process until stop_pondering is called
+        or it has used the same playout budget or time limit as a search in make_move, and its statistics are
+        reused by the next call to make_move.
+
+        Preconditions:
+            - the last move of the game is the last move returned by make_move, or the game has no moves
+        """
+        if not self.pondering or self._ponder_thread is not None:
+            return
+        self._check_new_game(game)
+        position_key = game.position_key()
+        if self._search_root is None or self._search_root.position_key != position_key:
+            last_player = "White" if game.current_player == "Black" else "Black"
+            self._search_root = SearchNode(None, last_player, position_key)
+        self._search_root.book = self.gt
+        max_moves = self.max_moves if self.max_moves is not None else 3 * game.board.size ** 2
+        self._ponder_stop.clear()
+        budget_used = budget(self.playouts, self.time_limit)
+
+        def should_stop(playouts: int) -> bool:
+            return self._ponder_stop.is_set() or budget_used(playouts)
+
+        self._ponder_thread = threading.Thread(
+            target=run_search, daemon=True,
+            args=(self._search_root, game.copy(), should_stop, self._ponder_rng, self.exploration, max_moves,
+                  self._expand))
+        self._ponder_thread.start()
+
+    def stop_pondering(self) -> None:
+        """Stop the background search started by ponder, and wait until it has stopped"""
+        if self._ponder_thread is not None:
+            self._ponder_stop.set()
+            self._ponder_thread.join()
+            self._ponder_thread = None
+
+    def close(self) -> None:
+        """Stop the worker processes of this player, if it has any"""
+        self.stop_pondering()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
 
 
 if __name__ == '__main__':
@@ -0,0 +1,257 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains a Monte Carlo Tree Search (MCTS): starting from the current position, it
+repeatedly selects a line of play with the UCT formula, adds one new position to its search tree,
+finishes the game with random moves (a playout) and records who won along the line. The more
+playouts it is given, the better the statistics of the moves at the root.
+
+The search can also be spread over a pool of worker processes, since playouts in pure python cannot run
+in parallel threads:
+    - root parallelism: every worker searches its own tree from the same position with a different seed,
+      and the visits and wins of the moves at the root of those trees are added together
+    - leaf parallelism: a single tree is searched, and every leaf it reaches is scored with a batch
+      of playouts shared out among the workers
+
+It is used by go_player.MCTSPlayer, and does not depend on pygame so it can also run in worker processes.
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+import math
+import random
+import time
+from multiprocessing.pool import Pool
+from typing import Callable, Optional
+from game import Game
+
+PASS_MOVE = (-1, -1)
+
+
+class SearchNode:
+    """A node of a Monte Carlo search tree, representing the position reached by playing its move
+
+    Instance Attributes:
+        - move: the (x, y) move leading to this node from its parent ((-1, -1) for a pass, None for the root)
+        - player: the player who made the move, whose wins are counted by this node
+        - position_key: the Game.position_key() of the position reached
+        - visits: the number of playouts through this node, including the visits given by its prior
+        - wins: the number of those playouts won by player
+        - children: the expanded children of this node, keyed by their move
+        - untried: the moves of this position which have no child yet, or None if they have not been listed
+        - book: the node of the opening GameTree for this position, or None if it is not in the book
+
+    Representation Invariants:
+        - 0 <= self.wins <= self.visits
+        - all(child.move == move for move, child in self.children.items())
+    """
+    __slots__ = ('move', 'player', 'position_key', 'visits', 'wins', 'children', 'untried', 'book')
+    move: Optional[tuple[int, int]]
+    player: str
+    position_key: int
+    visits: float
+    wins: float
+    children: dict[tuple[int, int], SearchNode]
+    untried: Optional[list[tuple[int, int]]]
+    book: Optional[object]
+
+    def __init__(self, move: Optional[tuple[int, int]], player: str, position_key: int,
+                 book: Optional[object] = None) -> None:
+        """Initialize a new search node with no visits"""
+        self.move = move
+        self.player = player
+        self.position_key = position_key
+        self.visits = 0
+        self.wins = 0
+        self.children = {}
+        self.untried = None
+        self.book = book
+
+    def best_move(self) -> tuple[int, int]:
+        """Return the move of the most visited child of this node
+
+        Preconditions:
+            - self.children != {}
+        """
+        return max(self.children.values(), key=lambda child: child.visits).move
+
+    def select_child(self, exploration: float) -> SearchNode:
+        """Return the child maximising the UCT formula: its win rate plus an exploration bonus which
+        is larger for children with fewer visits
+
+        Preconditions:
+            - self.children != {}
+        """
+        log_visits = math.log(max(self.visits, 1))
+        best_child, best_value = None, -1.0
+        for child in self.children.values():
+            value = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best_child, best_value = child, value
+        return best_child
+
+
+def is_finished(game: Game, max_moves: int) -> bool:
+    """Return whether the game is over: both players passed in a row, or max_moves moves were played"""
+    return len(game.moves) >= max_moves or game.is_game_over()
+
+
+def candidate_moves(game: Game, max_moves: int) -> list[tuple[int, int]]:
+    """Return the moves the search considers in the current position: every available move except filling
+    one's own eyes, or a pass if there is no such move. A finished game has no moves."""
+    if is_finished(game, max_moves):
+        return []
+    moves = [move for move in game.available_moves() if not _is_own_eye(game, move)]
+    return moves if moves else [PASS_MOVE]
+
+
+def _is_own_eye(game: Game, move: tuple[int, int]) -> bool:
+    """Return whether every neighbour of the given point is a stone of the current player"""
+    x, y = move
+    return all(game.board.get_color(x + dx, y + dy) == game.current_player
+               for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)) if game.board.is_valid_coord(x + dx, y + dy))
+
+
+def playout(game: Game, rng: random.Random, max_moves: int) -> str:
+    """Finish the given game with random moves, which never fill in a player's own eyes, and return the
+    winner ("Black" or "White") according to Game.overall_score. The game is mutated."""
+    while not is_finished(game, max_moves):
+        move = game.random_move(rng)
+        if move is None:
+            game.pass_turn()
+        else:
+            game.play_move(move[0], move[1])
+    white_score, black_score = game.overall_score()
+    return "Black" if black_score > white_score else "White"
+
+
+def run_search(root: SearchNode, game: Game, should_stop: Callable[[int], bool], rng: random.Random,
+               exploration: float = 1.4, max_moves: int = 250,
+               expand: Optional[Callable[[SearchNode, Game, SearchNode], None]] = None,
+               simulate: Optional[Callable[[Game], tuple[int, int]]] = None) -> int:
+    """Run playouts from the position of the given game, which is the position of root, adding their results to
+    the search tree below root, until should_stop(number of playouts run so far) returns True.
+    Returns the number of playouts run.
+
+    Each iteration selects children with SearchNode.select_child, expands one untried move chosen at random,
+    finishes the game with playout, and counts the result in every node along its line.
+    If given, expand(parent, game, child) is called for every new child, with the game at the position of child,
+    e.g. to give the child prior visits and wins.
+    If given, simulate(game) replaces the single playout of each iteration, and returns the number of playouts
+    won by black and the number of playouts it ran from the position of the game, without mutating it.
+
+    The given game is not mutated: every playout is played on a copy of it.
+    """
+    playouts = 0
+    while not should_stop(playouts):
+        current = game.copy()
+        node = root
+        path = [root]
+        while node.untried == [] and node.children:
+            node = node.select_child(exploration)
+            current.play_move(node.move[0], node.move[1])
+            path.append(node)
+
+        if node.untried is None:
+            node.untried = candidate_moves(current, max_moves)
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            player = current.current_player
+            current.play_move(move[0], move[1])
+            child = SearchNode(move, player, current.position_key())
+            if expand is not None:
+                expand(node, current, child)
+            node.children[move] = child
+            node = child
+            path.append(node)
+
+        if simulate is None:
+            black_wins, count = int(playout(current, rng, max_moves) == "Black"), 1
+        else:
+            black_wins, count = simulate(current)
+        for node in path:
+            node.visits += count
+            node.wins += black_wins if node.player == "Black" else count - black_wins
+        playouts += count
+    return playouts
+
+
+def budget(playouts: Optional[int], time_limit: Optional[float]) -> Callable[[int], bool]:
+    """Return a should_stop function for run_search which stops after the given number of playouts, or once the
+    given number of seconds have passed since this function was called, whichever comes first (None for no limit)
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    def should_stop(playouts_run: int) -> bool:
+        return (playouts is not None and playouts_run >= playouts) or \
+            (deadline is not None and time.perf_counter() >= deadline)
+
+    return should_stop
+
+
+def root_parallel_search(pool: Pool, workers: int, game: Game, rng: random.Random, playouts: Optional[int],
+                         time_limit: Optional[float], exploration: float = 1.4, max_moves: int = 250) -> SearchNode:
+    """Search the position of the given game with a separate tree in each of the given number of workers of the
+    pool, and return a root whose children add up the visits and wins of the children of all of those roots.
+    The playout budget is shared out among the workers, and every worker searches for the whole time limit.
+
+    Only the root of the returned tree has children.
+    """
+    seeds = [rng.getrandbits(32) for _ in range(workers)]
+    shares = [None] * workers if playouts is None else \
+        [playouts // workers + (1 if i < playouts % workers else 0) for i in range(workers)]
+    tasks = [(game, seed, share, time_limit, exploration, max_moves) for seed, share in zip(seeds, shares)]
+    last_player = "White" if game.current_player == "Black" else "Black"
+    root = SearchNode(None, last_player, game.position_key())
+    root.untried = []
+    for children in pool.map(_search_worker, tasks):
+        for move, (position_key, visits, wins) in children.items():
+            if move not in root.children:
+                root.children[move] = SearchNode(move, game.current_player, position_key)
+            child = root.children[move]
+            child.visits += visits
+            child.wins += wins
+            root.visits += visits
+    return root
+
+
+def _search_worker(task: tuple[Game, int, Optional[int], Optional[float], float, int]
+                   ) -> dict[tuple[int, int], tuple[int, float, float]]:
+    """Search the position of the game of the given (game, seed, playouts, time limit, exploration, max moves)
+    task in a worker process of root_parallel_search, and return the (position key, visits, wins) of every
+    child of the root of the search, by move"""
+    game, seed, playouts, time_limit, exploration, max_moves = task
+    root = SearchNode(None, "", game.position_key())
+    run_search(root, game, budget(playouts, time_limit), random.Random(seed), exploration, max_moves)
+    return {move: (child.position_key, child.visits, child.wins) for move, child in root.children.items()}
+
+
+def leaf_simulator(pool: Pool, workers: int, playouts_per_worker: int, rng: random.Random,
+                   max_moves: int = 250) -> Callable[[Game], tuple[int, int]]:
+    """Return a simulate function for run_search which runs playouts_per_worker playouts in each of the
+    given number of workers of the pool from every leaf"""
+
+    def simulate(game: Game) -> tuple[int, int]:
+        tasks = [(game, rng.getrandbits(32), playouts_per_worker, max_moves) for _ in range(workers)]
+        return sum(pool.map(_playout_worker, tasks)), workers * playouts_per_worker
+
+    return simulate
+
+
+def _playout_worker(task: tuple[Game, int, int, int]) -> int:
+    """Run the playouts of the given (game, seed, playouts, max moves) task in a worker process of
+    leaf_simulator, and return how many of them black won"""
+    game, seed, playouts, max_moves = task
+    rng = random.Random(seed)
+    return sum(playout(game.copy(), rng, max_moves) == "Black" for _ in range(playouts))
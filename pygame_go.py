@@ -48,6 +48,14 @@ BACKGROUND = (240, 230, 200)
 WIDTH = BOARD_SIZE * CELL_SIZE + 2 * MARGIN
 HEIGHT = BOARD_SIZE * CELL_SIZE + 2 * MARGIN
 
+# column labels, enough for a 19x19 board
+LETTERS = "ABCDEFGHIJKLMNOPQRS"
+
+
+def window_size(board_size: int) -> tuple[int, int]:
+    """Return the width and height of the pygame window showing a board of the given size"""
+    return board_size * CELL_SIZE + 2 * MARGIN, board_size * CELL_SIZE + 2 * MARGIN
+
 
 def return_row_col(x, y) -> tuple[int, int]:
     """
@@ -70,8 +78,10 @@ def initialise_display(game: Game) -> Surface:
     """
 
     # set up the pygame surface
+    board_size = game.board.size
+    width, height = window_size(board_size)
     pygame.display.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = pygame.display.set_mode((width, height))
     pygame.display.set_caption("Go Board")
     pygame.font.init()
     font = pygame.font.Font(None, 24)
@@ -80,31 +90,31 @@ def initialise_display(game: Game) -> Surface:
     pygame.event.clear()
 
     # Draw grid lines
-    for i in range(BOARD_SIZE):
+    for i in range(board_size):
         pygame.draw.line(screen, BLACK, (MARGIN + i * CELL_SIZE, MARGIN),
-                         (MARGIN + i * CELL_SIZE, HEIGHT - MARGIN - 50), 1)
+                         (MARGIN + i * CELL_SIZE, height - MARGIN - 50), 1)
         pygame.draw.line(screen, BLACK, (MARGIN, MARGIN + i * CELL_SIZE),
-                         (WIDTH - MARGIN - 50, MARGIN + i * CELL_SIZE),
+                         (width - MARGIN - 50, MARGIN + i * CELL_SIZE),
                          1)
 
     # Draw letters
-    for i, letter in enumerate("ABCDEFGHIJKLMNOP"):
-        if i < BOARD_SIZE:
+    for i, letter in enumerate(LETTERS):
+        if i < board_size:
             label = font.render(letter, True, BLACK)
             screen.blit(label, (MARGIN + i * CELL_SIZE - LETTER_OFFSET + 5, MARGIN - 2 * LETTER_OFFSET))
-            # screen.blit(label, (MARGIN + i * CELL_SIZE - LETTER_OFFSET + 5, HEIGHT - MARGIN + NUMBER_OFFSET - 50))
+            # screen.blit(label, (MARGIN + i * CELL_SIZE - LETTER_OFFSET + 5, height - MARGIN + NUMBER_OFFSET - 50))
 
     # Draw numbers on sides of board
-    for i in range(BOARD_SIZE):
+    for i in range(board_size):
         label = font.render(str(i + 1), True, BLACK)
         screen.blit(label, (MARGIN - 2 * NUMBER_OFFSET, MARGIN + i * CELL_SIZE - NUMBER_OFFSET + 5))
-        # screen.blit(label, (WIDTH - MARGIN + NUMBER_OFFSET - 50, MARGIN + i * CELL_SIZE - NUMBER_OFFSET + 5))
+        # screen.blit(label, (width - MARGIN + NUMBER_OFFSET - 50, MARGIN + i * CELL_SIZE - NUMBER_OFFSET + 5))
 
     for move in game.moves:
-        # if (-1, -1) == move[1:]:
-        #     break
+        if (-1, -1) == move[1:]:  # passes have no stone to draw
+            continue
 
-        color = (game.board.get_stone(move[1], move[2])).color
+        color = game.board.get_color(move[1], move[2])
         if color != "Neither":
             if color == "White":
                 color = WHITE
@@ -134,6 +144,8 @@ def update_display(screen: Surface, game: Game, territory: bool = False, techniq
     pygame.event.clear()
 
     font = pygame.font.Font(None, 24)
+    board_size = game.board.size
+    width, height = window_size(board_size)
 
     if pause:
         # pause nesscary for when both players are AI to prevent flickering
@@ -143,31 +155,31 @@ def update_display(screen: Surface, game: Game, territory: bool = False, techniq
     screen.fill(BACKGROUND)
 
     # Draw grid lines
-    for i in range(BOARD_SIZE):
+    for i in range(board_size):
         pygame.draw.line(screen, BLACK, (MARGIN + i * CELL_SIZE, MARGIN),
-                         (MARGIN + i * CELL_SIZE, HEIGHT - MARGIN - 50), 1)
+                         (MARGIN + i * CELL_SIZE, height - MARGIN - 50), 1)
         pygame.draw.line(screen, BLACK, (MARGIN, MARGIN + i * CELL_SIZE),
-                         (WIDTH - MARGIN - 50, MARGIN + i * CELL_SIZE),
+                         (width - MARGIN - 50, MARGIN + i * CELL_SIZE),
                          1)
 
     # Draw letters
-    for i, letter in enumerate("ABCDEFGHIJKLMNOP"):
-        if i < BOARD_SIZE:
+    for i, letter in enumerate(LETTERS):
+        if i < board_size:
             label = font.render(letter, True, BLACK)
             screen.blit(label, (MARGIN + i * CELL_SIZE - LETTER_OFFSET + 5, MARGIN - 2 * LETTER_OFFSET))
-            # screen.blit(label, (MARGIN + i * CELL_SIZE - LETTER_OFFSET + 5, HEIGHT - MARGIN + NUMBER_OFFSET - 50))
+            # screen.blit(label, (MARGIN + i * CELL_SIZE - LETTER_OFFSET + 5, height - MARGIN + NUMBER_OFFSET - 50))
 
     # Draw numbers
-    for i in range(BOARD_SIZE):
+    for i in range(board_size):
         label = font.render(str(i + 1), True, BLACK)
         screen.blit(label, (MARGIN - 2 * NUMBER_OFFSET, MARGIN + i * CELL_SIZE - NUMBER_OFFSET + 5))
-        # screen.blit(label, (WIDTH - MARGIN + NUMBER_OFFSET - 50, MARGIN + i * CELL_SIZE - NUMBER_OFFSET + 5))
+        # screen.blit(label, (width - MARGIN + NUMBER_OFFSET - 50, MARGIN + i * CELL_SIZE - NUMBER_OFFSET + 5))
 
     for move in game.moves:
-        # if (-1, -1) == move[1:]:
-        #     break
+        if (-1, -1) == move[1:]:  # passes have no stone to draw
+            continue
 
-        color = (game.board.get_stone(move[1], move[2])).color
+        color = game.board.get_color(move[1], move[2])
         if color != "Neither":
             if color == "White":
                 color = WHITE
@@ -178,7 +190,7 @@ def update_display(screen: Surface, game: Game, territory: bool = False, techniq
 
     # Draw territory
     if territory:
-        territories = game.board.calculate_score(technique)
+        territories = game.territory(technique)
         square_size = 16
         for x, y in territories[0]:  # black territory
             rect_color = BLACK
@@ -239,14 +251,14 @@ def draw_board(given_board: Board, save_path: str = "Game_images/saved_board.jpg
     # Draw the stones
     for x in range(given_board.size):
         for y in range(given_board.size):
-            stone = given_board.get_stone(x, y)
-            if stone.color != "Neither":
+            color = given_board.get_color(x, y)
+            if color != "Neither":
                 radius = (cell_size // 2) - 4
                 stone_x = padding + x * cell_size
                 stone_y = padding + y * cell_size
                 draw.ellipse([(stone_x - radius, stone_y - radius),
                               (stone_x + radius, stone_y + radius)],
-                             fill=stone.color.lower())
+                             fill=color.lower())
 
     # Draw territory
     if territory:
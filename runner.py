@@ -17,12 +17,14 @@ See README file for instructions, project details, and the relevant copyright an
 """
 
 import random
+from multiprocessing import Pool
+from typing import Optional
 from game import Game
-from pygame_go import initialise_display, update_display
 from gametree import GameTree
 from sgf_reader import load_tree_from_file, save_tree_to_file
 from go_player import ProbabilityBaseGoplayer, GoPlayer, FullyRandom, UserGoPlayer
-import plotly.graph_objs as g_obj
+from selfplay import play_turn
+from batch_score import game_record, score_records
 
 # import sys
 # from typing import Tuple
@@ -84,34 +86,36 @@ def run_game() -> None:
 
 
 def run_game_players(b_player: GoPlayer, w_player: GoPlayer, board_size: int = 9) -> None:
-    """Runs a game of Go using the selected players types and board_size"""
+    """Runs a game of Go using the selected players types and board_size
+
+    While one player chooses its move, the other player may ponder it (see GoPlayer.ponder)."""
+    # imported here so that the games without a display can be run without pygame
+    from pygame_go import initialise_display, update_display
+
     new_game = Game(size=board_size)
     display = initialise_display(new_game)
 
     if isinstance(b_player, UserGoPlayer) or isinstance(w_player, UserGoPlayer):
         while True:
             if len(new_game.moves) % 2 == 0:
-                x, y = b_player.make_move(new_game)
-                new_game.play_move(x, y)
+                play_turn(new_game, b_player, w_player)
                 update_display(display, new_game)
             else:
-                x, y = w_player.make_move(new_game)
-                new_game.play_move(x, y)
+                play_turn(new_game, w_player, b_player)
                 update_display(display, new_game)
 
     else:
         while len(new_game.moves) <= 65:
             if len(new_game.moves) % 2 == 0:
-                x, y = b_player.make_move(new_game)
-                new_game.play_move(x, y)
-
+                play_turn(new_game, b_player, w_player)
                 update_display(display, new_game, pause=True)
             else:
-                x, y = w_player.make_move(new_game)
-                new_game.play_move(x, y)
+                play_turn(new_game, w_player, b_player)
                 update_display(display, new_game, pause=True)
 
         update_display(display, new_game, territory=True, pause=True)
+    b_player.stop_pondering()
+    w_player.stop_pondering()
 
 
 def simulate_game(max_moves: int, game_tree: GameTree) -> tuple[Game, float]:
@@ -123,6 +127,16 @@ def simulate_game(max_moves: int, game_tree: GameTree) -> tuple[Game, float]:
         White is a tree based probability AI
     """
 
+    game = play_simulated_game(max_moves, game_tree)
+
+    win = game.overall_score("dfs")
+    print_winner(win)
+
+    return game, win[1] - win[0]
+
+
+def play_simulated_game(max_moves: int, game_tree: GameTree) -> Game:
+    """Plays the game of simulate_game without scoring it, and returns the finished game"""
     game = Game()
 
     random_player = FullyRandom(game_tree)
@@ -138,39 +152,60 @@ def simulate_game(max_moves: int, game_tree: GameTree) -> tuple[Game, float]:
         if not check:
             chosen_move = random.choice(game.available_moves())
             game.play_move(chosen_move[0], chosen_move[1])
+    return game
 
-    win = game.overall_score("dfs")
-    if game.iswinner("White"):
-        print("white wins by", win[0] - win[1])
 
-    elif game.iswinner("Black"):
+def print_winner(win: tuple[float, float]) -> None:
+    """Prints the winner of a game with the given (white score, black score) overall score"""
+    if win[0] > win[1]:
+        print("white wins by", win[0] - win[1])
+    elif win[1] > win[0]:
         print("black wins by", win[1] - win[0])
     else:
         print("tie")
 
-    return game, win[1] - win[0]
-
 
-def simulate_games(n: int) -> tuple[float, float]:
+def simulate_games(n: int, processes: Optional[int] = 1, seed: Optional[int] = None) -> tuple[float, float]:
     """Run n AI games and print the results
 
+    Every game is played with its own seed, derived from the given seed (or from a random seed if it is None),
+    so that runs with the same seed and number of processes give the same results.
+    With one process, every game is played with the tree updated by the games before it. With more processes
+    (all the cores if None), the games are played in worker processes, all with the tree as it was loaded,
+    and are then inserted into the tree in the order they were started.
+
     Notes:
         Black is a Random guessing AI
         White is a tree based probability AI
     """
     # wins = []
-    tree = load_tree_from_file("experimental.txt", "tree_saves/")
+    tree = load_tree_from_file("experimental.txt", "tree_saves/", lazy=False)
     white_win_rate = 0
     black_win_rate = 0
-    for _ in range(n):
-        # game, win = simulate_game(50, tree)
-        result = simulate_game(50, tree)
-        game = result[0]
-        if game.iswinner("White"):
+    seed_generator = random.Random(seed)
+    seeds = [seed_generator.getrandbits(32) for _ in range(n)]
+    if processes == 1:
+        scored_games = []
+        for game_seed in seeds:
+            moves, record = simulate_seeded_game(50, tree, game_seed)
+            scored_games.append((moves, score_records([record])[0]))
+            _insert_scored_game(tree, *scored_games[-1])
+    else:
+        # the tree is sent once to each worker rather than with every game
+        with Pool(processes, initializer=_init_simulation_worker, initargs=(tree,)) as pool:
+            results = pool.map(_simulate_game_worker, seeds)
+        # the finished games are scored together, in batches if numpy is installed
+        scores = score_records([record for _, record in results])
+        scored_games = [(moves, score) for (moves, _), score in zip(results, scores)]
+        for moves, score in scored_games:
+            _insert_scored_game(tree, moves, score)
+
+    for _, (white_score, black_score) in scored_games:
+        print_winner((white_score, black_score))
+        if white_score > black_score:
             white_win_rate += 1
         else:
             black_win_rate += 1
-        tree.insert_game_into_tree_absolute(game)
 
     save_tree_to_file(tree, "experimental.txt", "tree_saves/")
     print("black win rate:", black_win_rate / n)
@@ -179,18 +214,62 @@ def simulate_games(n: int) -> tuple[float, float]:
     return black_win_rate / n, white_win_rate / n
 
 
-def plot_win_rate_progress(n_games: int, n_simulations: int) -> None:
+def _insert_scored_game(tree: GameTree, moves: list[tuple[int, int, int]], scores: tuple[float, float]) -> None:
+    """Insert the moves of a game with the given (white score, black score) into the tree, with 1 if black won
+    and 0 otherwise, as GameTree.insert_game_into_tree_absolute does"""
+    white_score, black_score = scores
+    tree.insert_move_sequence(moves, 1 if black_score > white_score else 0)
+
+
+def simulate_seeded_game(max_moves: int, game_tree: GameTree,
+                         seed: int) -> tuple[list[tuple[int, int, int]], tuple[int, bytes, int, int]]:
+    """Play a game as in simulate_game, with the random module seeded with the given seed, and return its moves
+    and its batch_score.game_record, which is all that is needed to score it
+
+    The state of the random module is restored afterwards.
+    """
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        game = play_simulated_game(max_moves, game_tree)
+    finally:
+        random.setstate(state)
+    return game.moves, game_record(game)
+
+
+_worker_tree = None
+
+
+def _init_simulation_worker(game_tree: GameTree) -> None:
+    """Keep the tree used by the games of a worker process of simulate_games"""
+    global _worker_tree
+    _worker_tree = game_tree
+
+
+def _simulate_game_worker(seed: int) -> tuple[list[tuple[int, int, int]], tuple[int, bytes, int, int]]:
+    """Simulate the game with the given seed in a worker process of simulate_games"""
+    return simulate_seeded_game(50, _worker_tree, seed)
+
+
+def plot_win_rate_progress(n_games: int, n_simulations: int, processes: Optional[int] = 1,
+                           seed: Optional[int] = None) -> None:
     """plot the win rate (black vs white) for given number of games and simulations
 
+    The games of each simulation are played in the given number of processes, and a seed for each simulation
+    is derived from the given seed, so that the same seed always gives the same plot (see simulate_games).
+
     Notes:
         Black is a Random guessing AI
         White is a tree based probability AI
     """
+    import plotly.graph_objs as g_obj
+
     black_win_rates = []
     white_win_rates = []
+    seed_generator = random.Random(seed)
 
     for _ in range(1, n_simulations + 1):
-        black_win_rate, white_win_rate = simulate_games(n_games)
+        black_win_rate, white_win_rate = simulate_games(n_games, processes, seed_generator.getrandbits(32))
         black_win_rates.append(black_win_rate)
         white_win_rates.append(white_win_rate)
 
@@ -0,0 +1,119 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains functions for playing games between two AI players without a display, so that
+they can be run on a server without pygame. The result of every game is returned as soon as it is
+finished, so that long runs of games can be followed and saved as they go.
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+import time
+from typing import Iterator, NamedTuple
+from game import Game
+from go_player import GoPlayer
+
+DEFAULT_MAX_MOVES = 100
+
+
+class GameResult(NamedTuple):
+    """The result of a finished game
+
+    Instance Attributes:
+        - index: the number of the game in its run of games, starting from 0
+        - game: the finished game
+        - moves: the (move number, x, y) moves of the game
+        - black_score: the overall score of black
+        - white_score: the overall score of white
+        - winner: the winning player, as decided by Game.iswinner
+        - seconds: the time taken to play the game, in seconds
+
+    Representation Invariants:
+        - self.winner in {'Black', 'White'}
+        - self.seconds >= 0
+    """
+    index: int
+    game: Game
+    moves: list[tuple[int, int, int]]
+    black_score: float
+    white_score: float
+    winner: str
+    seconds: float
+
+
+def play_turn(game: Game, player: GoPlayer, opponent: GoPlayer) -> bool:
+    """Play the move chosen by the given player in the game, while its opponent ponders (see GoPlayer.ponder).
+    Return whether the move could be played."""
+    opponent.ponder(game)
+    try:
+        x, y = player.make_move(game)
+    finally:
+        opponent.stop_pondering()
+    return game.play_move(x, y)
+
+
+def play_game(black: GoPlayer, white: GoPlayer, max_moves: int = DEFAULT_MAX_MOVES, board_size: int = 9) -> Game:
+    """Play a game between the two given players until both pass, no move is available, or max_moves moves
+    have been played, and return the finished game.
+
+    A move which cannot be played is replaced by a random available move, or a pass if there is none.
+
+    Preconditions:
+        - max_moves > 0
+        - board_size >= 9
+    """
+    game = Game(size=board_size)
+    while not game.game_end(max_moves) and not game.is_game_over():
+        if game.current_player == "Black":
+            played = play_turn(game, black, white)
+        else:
+            played = play_turn(game, white, black)
+        if not played:
+            move = game.random_move(avoid_eyes=False)
+            if move is None:
+                game.pass_turn()
+            else:
+                game.play_move(move[0], move[1])
+    return game
+
+
+def play_games(black: GoPlayer, white: GoPlayer, n: int, max_moves: int = DEFAULT_MAX_MOVES,
+               board_size: int = 9) -> Iterator[GameResult]:
+    """Play n games between the two given players, with black always playing first, and yield the result
+    of each game as soon as it is finished
+
+    The same players are used for every game, so they must be able to start a new game after finishing one.
+
+    Preconditions:
+        - n >= 0
+        - max_moves > 0
+        - board_size >= 9
+    """
+    for index in range(n):
+        start = time.perf_counter()
+        game = play_game(black, white, max_moves, board_size)
+        white_score, black_score = game.overall_score()
+        winner = "White" if game.iswinner("White") else "Black"
+        yield GameResult(index, game, list(game.moves), black_score, white_score, winner,
+                         time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    # from go_player import FullyRandom, MCTSPlayer
+    # for result in play_games(MCTSPlayer(playouts=200), FullyRandom(None), 10):
+    #     print(result.index, result.winner, result.black_score - result.white_score, f'{result.seconds:.1f}s')
@@ -47,14 +47,220 @@ See README file for full details
 from __future__ import annotations
 import os
 import pickle
+import re
+from multiprocessing import Pool
+from typing import Callable, Iterator, Optional
 import board as b
-from gametree import GameTree
-from game import Game
+from gametree import GameTree, TranspositionGameTree
+from game import Game, handicap_first_player
+from symmetry import transform_sequence
+from tree_file import MappedGameTree, write_tree, open_tree, read_tree, is_tree_file
+from batch_score import game_record, score_records
 
 # import shutil
 # from typing import Optional
 
 
+# a margin given to the winner when the game was won by resignation, time or forfeit, since the SGF result does
+# not say by how much the winner was ahead (it is a little larger than the typical margin of our 9x9 games)
+DEFAULT_WIN_MARGIN = 10.0
+
+# one token of an SGF file: a bracket or semicolon, or a property identifier with all of its [values]
+_SGF_TOKEN = re.compile(r'\s*(?:([();])|([A-Za-z]+)\s*((?:\[(?:[^\]\\]|\\.)*\]\s*)+))', re.DOTALL)
+_SGF_VALUE = re.compile(r'\[((?:[^\]\\]|\\.)*)\]', re.DOTALL)
+_SGF_ESCAPE = re.compile(r'\\(\r\n?|\n\r?|.)', re.DOTALL)
+
+
+def parse_sgf(text: str) -> Iterator[dict[str, list[str]]]:
+    """Parse the given SGF text in a single pass, and yield the nodes of the main line of its first game,
+    starting with the root node. Each node maps its property identifiers to their lists of values.
+
+    Only the first variation is followed wherever the game tree branches.
+
+    >>> nodes = list(parse_sgf('(;SZ[9]AB[aa][bb];B[cc]C[a \\\\] b](;W[dd])(;W[ee]))'))
+    >>> nodes[0]
+    {'SZ': ['9'], 'AB': ['aa', 'bb']}
+    >>> nodes[1]
+    {'B': ['cc'], 'C': ['a ] b']}
+    >>> nodes[2]
+    {'W': ['dd']}
+    >>> len(nodes)
+    3
+    """
+    depth = 0
+    # whether a variation has ended, after which every new variation is a sibling of one we followed
+    variation_ended = False
+    # the depth of the variation being skipped, or 0 if no variation is being skipped
+    skip_depth = 0
+    node = None
+    for match in _SGF_TOKEN.finditer(text):
+        symbol, identifier, values = match.groups()
+        if skip_depth:
+            if symbol == '(':
+                depth += 1
+            elif symbol == ')':
+                depth -= 1
+                if depth < skip_depth:
+                    skip_depth = 0
+        elif identifier is not None:
+            if node is not None:
+                # old versions of the format allow lowercase letters in identifiers, which are ignored
+                identifier = ''.join(char for char in identifier if char.isupper())
+                node.setdefault(identifier, []).extend(_unescape_sgf_value(value)
+                                                       for value in _SGF_VALUE.findall(values))
+        else:
+            if node is not None:
+                yield node
+                node = None
+            if symbol == ';':
+                node = {}
+            elif symbol == '(':
+                depth += 1
+                if variation_ended:
+                    skip_depth = depth
+            else:
+                depth -= 1
+                variation_ended = True
+                if depth <= 0:
+                    return
+    if node is not None:
+        yield node
+
+
+def _unescape_sgf_value(value: str) -> str:
+    """Return the given SGF property value with its escaped characters and soft line breaks replaced"""
+    if '\\' not in value:
+        return value
+    return _SGF_ESCAPE.sub(lambda match: '' if match.group(1) in {'\n', '\r', '\r\n', '\n\r'} else match.group(1),
+                           value)
+
+
+def parse_sgf_file(file_name: str, file_directory: str) -> tuple[dict[str, list[str]], list[tuple[str, int, int]]]:
+    """Reads an SGF file once, and returns the properties of its root node together with the main line of
+    moves as (colour, x, y) tuples. A pass is given the coordinates (-1, -1).
+
+    Preconditions:
+        - file must be of type sgf
+    """
+    with open(file_directory + file_name, encoding='utf-8', errors='replace') as sgf_file:
+        nodes = parse_sgf(sgf_file.read())
+        root = next(nodes, {})
+        board_size = sgf_board_size(root)
+        moves = []
+        for node in nodes:
+            for identifier, color in (('B', 'Black'), ('W', 'White')):
+                if identifier in node:
+                    moves.append((color,) + sgf_point(node[identifier][0], board_size))
+        return root, moves
+
+
+def sgf_board_size(root: dict[str, list[str]]) -> int:
+    """Return the board size given by the properties of the root node of an SGF file (19 if it is not given)
+
+    >>> sgf_board_size({'SZ': ['9']})
+    9
+    >>> sgf_board_size({})
+    19
+    """
+    if 'SZ' not in root:
+        return 19
+    return int(root['SZ'][0].split(':')[0])
+
+
+def sgf_point(value: str, board_size: int) -> tuple[int, int]:
+    """Return the (x, y) coordinates of the given SGF point, or (-1, -1) if it is a pass
+
+    >>> sgf_point('cb', 9)
+    (2, 1)
+    >>> sgf_point('tt', 9)
+    (-1, -1)
+    """
+    if value == '' or (value == 'tt' and board_size <= 19):
+        return -1, -1
+    return ord(value[0]) - 97, ord(value[1]) - 97
+
+
+def sgf_result_margin(result: str) -> Optional[float]:
+    """Return the number of points by which black won the game with the given SGF result (negative if white won),
+    or None if the game has no result.
+
+    A win by resignation, time or forfeit is given the margin DEFAULT_WIN_MARGIN.
+
+    >>> sgf_result_margin('B+12')
+    12.0
+    >>> sgf_result_margin('W+2.5')
+    -2.5
+    >>> sgf_result_margin('W+Resign')
+    -10.0
+    >>> sgf_result_margin('Draw')
+    0.0
+    >>> sgf_result_margin('Void') is None
+    True
+    """
+    result = result.strip()
+    if result in {'0', 'Draw', 'D', 'Jigo'}:
+        return 0.0
+    elif len(result) < 2 or result[0] not in {'B', 'W'} or result[1] != '+':
+        return None
+    sign = 1 if result[0] == 'B' else -1
+    try:
+        return sign * float(result[2:])
+    except ValueError:
+        return sign * DEFAULT_WIN_MARGIN
+
+
+def sgf_setup_stones(root: dict[str, list[str]], board_size: int) -> list[tuple[str, int, int]]:
+    """Return the (colour, x, y) stones placed by the AB and AW properties of the given root node, in the
+    order they are given. A value may also be a compressed rectangle of points such as 'aa:bb'.
+
+    >>> sgf_setup_stones({'AB': ['cc', 'gg'], 'AW': ['aa:ab']}, 9)
+    [('Black', 2, 2), ('Black', 6, 6), ('White', 0, 0), ('White', 0, 1)]
+    """
+    stones = []
+    for identifier, color in (('AB', 'Black'), ('AW', 'White')):
+        for value in root.get(identifier, []):
+            if ':' in value:
+                first, last = value.split(':')
+                (x1, y1), (x2, y2) = sgf_point(first, board_size), sgf_point(last, board_size)
+                stones.extend((color, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1))
+            else:
+                stones.append((color,) + sgf_point(value, board_size))
+    return stones
+
+
+def sgf_handicap(root: dict[str, list[str]]) -> int:
+    """Return the handicap given by the HA property of the given root node, or 0 for an even game"""
+    try:
+        return int(root['HA'][0]) if 'HA' in root else 0
+    except ValueError:
+        return 0
+
+
+def sgf_first_player(root: dict[str, list[str]], moves: list[tuple[str, int, int]]) -> str:
+    """Return the player who makes the first move of the game: the colour of the first move if there is one,
+    then the player given by the PL property, and otherwise the usual first player for the handicap"""
+    if moves:
+        return moves[0][0]
+    elif root.get('PL', [''])[0] in {'B', 'W'}:
+        return 'Black' if root['PL'][0] == 'B' else 'White'
+    return handicap_first_player(sgf_handicap(root))
+
+
+def _board_from_moves(moves: list[tuple[str, int, int]], board_size: int) -> b.Board:
+    """Return a board with a stone on the point of every move (or setup stone) that is not a pass"""
+    board = b.Board(size=board_size)
+    for color, x, y in moves:
+        if (x, y) != (-1, -1):
+            board.add_stone(x, y, color)
+    return board
+
+
+def _numbered_moves(moves: list[tuple[str, int, int]]) -> list[tuple[int, int, int]]:
+    """Return the given moves as a sequence of moves for the GameTree"""
+    # index of turn, starts at 1 (0 is the default, placeholder move)
+    return [(i, x, y) for i, (_, x, y) in enumerate(moves, 1)]
+
+
 def read_sgf(file_name: str, file_directory: str, do_deletion: bool) -> None | b.Board:
     """
     Reads a single SGF file and checks if it has a valid result. If it does not have a valid result and
@@ -67,43 +273,28 @@ def read_sgf(file_name: str, file_directory: str, do_deletion: bool) -> None | b
         file_directory (str): The directory where the SGF file is located.
         do_deletion (bool): If True and the SGF file does not have a valid result, the file will be deleted.
     """
-    with open(file_directory + file_name) as sgf_file:
-        header = sgf_file.readline()
-        if header.find('RE') == -1:
-            print("Game does not have a valid result, unusable.")
-            if do_deletion:
-                print("Proceeding with deletion.")
-                try:
-                    # shutil.move(file_directory + file_name, "/DataSet/Unusable//" + file_name) does not work
-                    os.remove(file_directory + file_name)
-                except FileNotFoundError:
-                    print("Fail. File was not found.")
-                else:
-                    print("Success. File deleted.")
-                    return
-        else:
-            # Print some basic information about the game, helps with testing
-            print(f"Game has a valid result of {header[header.index('RE') + 2:header.index('KM')]} aka is usable.")
-            board_size = header[header.index('SZ') + 2:header.index('RE')]
-            board_size = board_size.translate({ord(i): None for i in '[]'})
-            num_size = int(board_size)
-            print("Boardsize:", num_size)
-            sgf_file.readline()
-            sgf_file.readline()
-            current_game = sgf_file.readline().split(';')
-            current_game = current_game[1:-2]
-
-            # generate the board class
-            board = b.Board(size=num_size)
-            for stone in current_game:
-                if stone[-2:] != "[]":  # is not a pass
-                    x = ord(stone[2]) - 97
-                    y = ord(stone[3]) - 97
-                    if stone[0] == "B":
-                        board.add_stone(x, y, "Black")
-                    elif stone[0] == "W":
-                        board.add_stone(x, y, "White")
-            # print(board)
+    root, moves = parse_sgf_file(file_name, file_directory)
+    if 'RE' not in root or sgf_result_margin(root['RE'][0]) is None:
+        print("Game does not have a valid result, unusable.")
+        if do_deletion:
+            print("Proceeding with deletion.")
+            try:
+                # shutil.move(file_directory + file_name, "/DataSet/Unusable//" + file_name) does not work
+                os.remove(file_directory + file_name)
+            except FileNotFoundError:
+                print("Fail. File was not found.")
+            else:
+                print("Success. File deleted.")
+                return
+    else:
+        # Print some basic information about the game, helps with testing
+        print(f"Game has a valid result of {root['RE'][0]} aka is usable.")
+    num_size = sgf_board_size(root)
+    print("Boardsize:", num_size)
+
+    # generate the board class
+    board = _board_from_moves(sgf_setup_stones(root, num_size) + moves, num_size)
+    # print(board)
     return board
 
 
@@ -123,203 +314,291 @@ def read_all_sgf_in_folder(folder_directory: str, do_deletion: bool = False):
     return boards
 
 
-def sgf_to_game_sequence(file_name: str, file_directory: str) -> tuple[list[tuple[int, int, int]], int]:
+def sgf_to_game_sequence(file_name: str, file_directory: str) -> tuple[list[tuple[int, int, int]], float]:
     """
     Reads an SGF file and converts it into a sequence of moves and win state for the GameTree
 
-    Returns a tuple containing the sequence of moves, and the win state
+    Returns a tuple containing the sequence of moves, and the win state: the margin by which black won,
+    which is negative if white won (see sgf_result_margin)
+
+    Raises ValueError if the game has no result.
 
     Preconditions:
         - file must be of type sgf
     """
-    with open(file_directory + file_name) as sgf_file:
-        header = sgf_file.readline()
-        if header.find('RE') != -1:
-            sgf_file.readline()
-            sgf_file.readline()
-            score_start_index = header.find('RE') + 3
-            game_score_str = header[score_start_index: score_start_index + 3]
-            if game_score_str[0] == 'B':
-                game_score = int(game_score_str[2])  # if it is a victory by black, it is positive
-            elif game_score_str[0] == 'W':  # if it is a victory by white, it is negative
-                game_score = -1 * int(game_score_str[2])
-            game = sgf_file.readline().split(';')
-            game = game[1:]
-            move_seq = []
-            i = 1  # index of turn, starts at 1 (0 is the default, placeholder move)
-            for stone in game:
-                if stone[1:3] == "[]":  # is a pass
-                    move_seq.append((i, -1, -1))
-                else:
-                    x = ord(stone[2]) - 97
-                    y = ord(stone[3]) - 97
-                    move_seq.append((i, x, y))
-                i += 1
-            return move_seq, game_score
-        else:
-            print('file: ', file_directory + file_name)
-            print('it seems this file has no result')
-            raise ValueError
+    root, moves = parse_sgf_file(file_name, file_directory)
+    game_score = sgf_result_margin(root['RE'][0]) if 'RE' in root else None
+    if game_score is None:
+        print('file: ', file_directory + file_name)
+        print('it seems this file has no result')
+        raise ValueError
+    return _numbered_moves(moves), game_score
 
 
-def sgf_to_game_sequence_absolute(file_name: str, file_directory: str) -> tuple[list[tuple[int, int, int]], int]:
+def sgf_to_game_sequence_absolute(file_name: str, file_directory: str) -> tuple[list[tuple[int, int, int]], float]:
     """
     Reads an SGF file and converts it into a sequence of moves and a win state (raw winrate)
     Note, this ignors the actual amount which either side won by, only who won.
 
-    Returns a tuple containing the sequence of moves, and the win state
+    Returns a tuple containing the sequence of moves, and the win state: 1 if black won, 0 if white won,
+    and 0.5 for a draw
+
+    Raises ValueError if the game has no result.
 
     Preconditions:
         - file must be of type sgf
     """
-    with open(file_directory + file_name) as sgf_file:
-        header = sgf_file.readline()
-        if header.find('RE') != -1:
-            sgf_file.readline()
-            sgf_file.readline()
-            score_start_index = header.find('RE') + 3
-            game_score_str = header[score_start_index: score_start_index + 3]
-            if game_score_str[0] == 'B':
-                game_score = 1  # if it is a victory by black, it is 1
-            elif game_score_str[0] == 'W':
-                game_score = 0  # if it is a victory by white, it is 0 (loss for black)
-            game = sgf_file.readline().split(';')
-            game = game[1:]
-            move_seq = []
-            i = 1  # index of turn, starts at 1 (0 is the default, placeholder move)
-            for stone in game:
-                if stone[1:3] == "[]":  # is a pass
-                    move_seq.append((i, -1, -1))
-                else:
-                    x = ord(stone[2]) - 97
-                    y = ord(stone[3]) - 97
-                    move_seq.append((i, x, y))
-                i += 1
-            return move_seq, game_score
-        else:
-            print('it seems this file has no result')
-            raise ValueError
+    move_seq, margin = sgf_to_game_sequence(file_name, file_directory)
+    return move_seq, _absolute_score(margin)
+
+
+def _absolute_score(margin: float) -> float:
+    """Return the raw win state of a game won by black by the given margin"""
+    if margin > 0:
+        return 1  # if it is a victory by black, it is 1
+    elif margin < 0:
+        return 0  # if it is a victory by white, it is 0 (loss for black)
+    else:
+        return 0.5
 
 
 def sgf_to_game(file_name: str, file_directory: str) -> Game:
     """Reads an SGF file and converts it into a Game class
-    Returns the game as a proper Game class
+    Returns the game as a proper Game class, including its handicap and setup stones
+
+    Raises ValueError if the game has no result.
+
+    Preconditions:
+        - file must be of type sgf
+    """
+    # procress the given file
+    root, moves = parse_sgf_file(file_name, file_directory)
+    if 'RE' not in root:
+        raise ValueError
+    num_size = sgf_board_size(root)
+    setup_stones = sgf_setup_stones(root, num_size)
+
+    # generating move sequence, and the board class
+    move_seq = _numbered_moves(moves)
+    board = _board_from_moves(setup_stones + moves, num_size)
+
+    first_player = sgf_first_player(root, moves)
+    second_player = "White" if first_player == "Black" else "Black"
+    if (len(move_seq)) % 2 == 0:
+        turn = first_player
+    else:
+        turn = second_player
+    # create the new Game class
+    current_game = Game(
+        active_board=board,
+        player_turn=turn,
+        move_sequence=move_seq,
+        size=num_size,
+        setup_stones=setup_stones,
+        handicap=sgf_handicap(root),
+    )
+    return current_game
+
+
+def sgf_to_game_record(file_name: str, file_directory: str) -> tuple[tuple, list[tuple[int, int, int]], float]:
+    """Reads an SGF file and returns the Game.setup_key() of its starting position, its sequence of moves,
+    and the margin by which black won (see sgf_result_margin)
+
+    Raises ValueError if the game has no result.
 
     Preconditions:
         - file must be of type sgf
     """
-    with open(file_directory + file_name) as sgf_file:
-
-        # procress the given file
-        header = sgf_file.readline()
-        if header.find('RE') != -1:
-            board_size = header[header.index('SZ') + 2:header.index('RE')]
-            board_size = board_size.translate({ord(i): None for i in '[]'})
-            num_size = int(board_size)
-            sgf_file.readline()
-            sgf_file.readline()
-            current_game = sgf_file.readline().split(';')
-            current_game = current_game[1:]
-
-            # generating move sequence
-            move_seq = []
-            i = 1  # index of turn, starts at 1 (0 is the default, placeholder move)
-            for stone in current_game:
-                if stone[1:3] == "[]":  # is a pass
-                    move_seq.append((i, -1, -1))
-                else:
-                    x = ord(stone[2]) - 97
-                    y = ord(stone[3]) - 97
-                move_seq.append((i, x, y))
-                i += 1
-
-            current_game = current_game[:-2]
-            # generate the board class
-            board = b.Board(size=num_size)
-            for stone in current_game:
-                if stone[1:3] != "[]":  # is not a pass
-                    x = ord(stone[2]) - 97
-                    y = ord(stone[3]) - 97
-                    if stone[0] == "B":
-                        board.add_stone(x, y, "Black")
-                    elif stone[0] == "W":
-                        board.add_stone(x, y, "White")
+    root, moves = parse_sgf_file(file_name, file_directory)
+    margin = sgf_result_margin(root['RE'][0]) if 'RE' in root else None
+    if margin is None:
+        print('file: ', file_directory + file_name)
+        print('it seems this file has no result')
+        raise ValueError
+    board_size = sgf_board_size(root)
+    setup_key = (board_size, sgf_handicap(root), tuple(sorted(sgf_setup_stones(root, board_size))))
+    return setup_key, _numbered_moves(moves), margin
+
+
+def sgf_to_replayed_record(file_name: str, file_directory: str
+                           ) -> tuple[tuple, list[tuple[int, int, int]], tuple[int, bytes, int, int]]:
+    """Reads an SGF file, replays the game, and returns the Game.setup_key() of its starting position,
+    its sequence of moves, and the batch_score.game_record of the final position, which is all that is
+    needed to score it
 
-        else:
-            raise ValueError
+    Preconditions:
+        - file must be of type sgf
+    """
+    game = sgf_to_game(file_name, file_directory)
+    return game.setup_key(), game.moves, game_record(game)
 
-        if (len(move_seq)) % 2 == 0:
-            turn = "Black"
-        else:
-            turn = "White"
-        # create the new Game class
-        current_game = Game(
-            active_board=board,
-            player_turn=turn,
-            move_sequence=move_seq,
-            size=num_size,
-        )
-        return current_game
-
-
-def sgf_folder_to_tree(folder_directory: str, is_absolute: bool = False) -> GameTree:
+
+def sgf_folder_to_tree(folder_directory: str, is_absolute: bool = False, transpositions: bool = False,
+                       canonical: bool = False, processes: Optional[int] = 1, board_size: int = 9) -> GameTree:
     """Returns a game tree by exctracting move sequences out of all sgf files in a given folder
 
+    Only the even games on a board of the given size are used: handicap games and games with other setup stones
+    have their own trees, which are returned by sgf_folder_to_trees.
+
+    If transpositions is True, the tree is a TranspositionGameTree, which merges the positions reached by
+    different move orders. If canonical is True, every game is inserted in its canonical orientation, so
+    the rotations and reflections of a game share their nodes.
+
+    The files are read by the given number of worker processes (all the cores if processes is None).
+    The resulting tree does not depend on the number of processes.
+
     Preconditions:
         - all files are of type sgf
+        - processes is None or processes >= 1
     """
-    tree = GameTree()
-    if is_absolute:
-        method = sgf_to_game_sequence_absolute
-    else:
-        method = sgf_to_game_sequence
-    for file in os.listdir(folder_directory):
-        sequence, probability = method(file, folder_directory)
-        tree.insert_move_sequence(sequence, probability)
-    return tree
+    trees = sgf_folder_to_trees(folder_directory, is_absolute, transpositions, canonical, processes=processes)
+    return trees.get((board_size, 0, ()), _new_tree((board_size, 0, ()), transpositions))
 
 
-def sgf_folder_to_tree_recalc_win_score(folder_directory: str) -> GameTree:
+def sgf_folder_to_tree_recalc_win_score(folder_directory: str, transpositions: bool = False,
+                                        canonical: bool = False, processes: Optional[int] = 1,
+                                        board_size: int = 9) -> GameTree:
     """Returns a game tree by exctracting move sequences out of all sgf files in a given folder
 
+    Only the even games on a board of the given size are used, as in sgf_folder_to_tree.
+
+    If transpositions is True, the tree is a TranspositionGameTree, which merges the positions reached by
+    different move orders. If canonical is True, every game is inserted in its canonical orientation, so
+    the rotations and reflections of a game share their nodes.
+
+    The games are replayed and scored by the given number of worker processes (all the cores if processes
+    is None). The resulting tree does not depend on the number of processes.
+
     Preconditions:
         - all files in folder are of type sgf
+        - processes is None or processes >= 1
     """
-    tree = GameTree()
-    for file in os.listdir(folder_directory):
-        game = sgf_to_game(file, folder_directory)
-        tree.insert_game_into_tree(game)
-    return tree
+    trees = sgf_folder_to_trees(folder_directory, False, transpositions, canonical, True, processes)
+    return trees.get((board_size, 0, ()), _new_tree((board_size, 0, ()), transpositions))
+
+
+def sgf_folder_to_trees(folder_directory: str, is_absolute: bool = False, transpositions: bool = False,
+                        canonical: bool = False, recalculate: bool = False,
+                        processes: Optional[int] = 1) -> dict[tuple, GameTree]:
+    """Returns a game tree for every starting position of the games in the given folder, keyed by the
+    Game.setup_key() of that position: (board size, handicap, setup stones). Even games on a 9x9 board
+    are therefore in the tree with the key (9, 0, ()), and each handicap has a separate tree.
+
+    If recalculate is True, every game is replayed and scored as in sgf_folder_to_tree_recalc_win_score.
+    The other parameters are the same as for sgf_folder_to_tree. The files which cannot be scored (e.g. games
+    without a result) are skipped, and so are the games with an illegal move in transposition trees; the numbers
+    of skipped files and games are printed.
+
+    Preconditions:
+        - all files in folder are of type sgf
+        - processes is None or processes >= 1
+    """
+    if recalculate:
+        replayed = _map_folder(sgf_to_replayed_record, folder_directory, processes)
+        replayed = _without_unscorable(replayed)
+        # the replayed boards are scored together, in batches if numpy is installed
+        scores = score_records([record for _, _, record in replayed])
+        records = [(setup_key, moves, black_score - white_score)
+                   for (setup_key, moves, _), (white_score, black_score) in zip(replayed, scores)]
+    else:
+        records = _without_unscorable(_map_folder(sgf_to_game_record, folder_directory, processes))
+
+    sequences_by_setup = {}
+    for setup_key, moves, margin in records:
+        score = _absolute_score(margin) if is_absolute else margin
+        sequences_by_setup.setdefault(setup_key, []).append((moves, score))
+
+    trees = {}
+    rejected = 0
+    for setup_key, sequences in sequences_by_setup.items():
+        board_size, _, setup_stones = setup_key
+        trees[setup_key] = _new_tree(setup_key, transpositions)
+        rejected += trees[setup_key].insert_move_sequences(sequences, canonical, board_size, setup_stones)
+    if rejected > 0:
+        print(rejected, 'games with an illegal move were skipped')
+    return trees
+
+
+def _new_tree(setup_key: tuple, transpositions: bool) -> GameTree:
+    """Return an empty game tree for games starting from the position with the given Game.setup_key()"""
+    if transpositions:
+        board_size, handicap, setup_stones = setup_key
+        return TranspositionGameTree(board_size=board_size, handicap=handicap, setup_stones=setup_stones)
+    else:
+        return GameTree()
+
+
+def _without_unscorable(records: list[Optional[tuple]]) -> list[tuple]:
+    """Return the given records of _map_folder without the None records of the files which could not be read,
+    printing how many there were"""
+    scorable = [record for record in records if record is not None]
+    if len(scorable) < len(records):
+        print(len(records) - len(scorable), 'files without a usable result were skipped')
+    return scorable
+
+
+def _map_folder(method: Callable[[str, str], tuple], folder_directory: str,
+                processes: Optional[int]) -> list[Optional[tuple]]:
+    """Return the result of calling method(file, folder_directory) for every file in the given folder,
+    in the order of os.listdir, using the given number of worker processes (all the cores if None).
+    The result is None for the files where method raises ValueError, such as games without a result.
+
+    Preconditions:
+        - method is a module-level function, so that it can be sent to the worker processes
+    """
+    files = os.listdir(folder_directory)
+    tasks = [(method, file, folder_directory) for file in files]
+    if processes == 1:
+        return [_call_method(task) for task in tasks]
+    # large chunks keep the cost of sending the tasks and results small compared to reading the files
+    chunk_size = max(1, len(tasks) // (4 * (processes or os.cpu_count() or 1)))
+    with Pool(processes) as pool:
+        return list(pool.imap(_call_method, tasks, chunk_size))
+
+
+def _call_method(task: tuple[Callable[[str, str], tuple], str, str]) -> Optional[tuple]:
+    """Call the method of the given (method, file, folder) task for _map_folder, possibly in a worker process,
+    and return None if it raises ValueError"""
+    method, file, folder_directory = task
+    try:
+        return method(file, folder_directory)
+    except ValueError:
+        return None
 
 
 def rotate_move_seq_by_90(moves: list[tuple[int, int, int]], board_size=9) -> list[tuple[int, int, int]]:
-    """Rotates a sequence of moves clockwise by 90 degrees
+    """Rotates a sequence of moves clockwise by 90 degrees, keeping the move numbers
 
     This is useful for increasing the amount of games already generated by using the symetry
-    of the board
+    of the board. To use all 8 symmetries at once, see the canonical option of sgf_folder_to_tree.
     """
-    rotated_sequence = []
-    id_added = 1000  # TODO: modify this (possibly with reference to total number of moves in data set)
-    for move in moves:  # TODO: check if this works
-        new_move = (id_added + move[0], move[2], board_size - move[1])
-        rotated_sequence.append(new_move)
-    return rotated_sequence
+    return transform_sequence(moves, 1, board_size)
 
 
 def save_tree_to_file(tree: GameTree, file_name: str, folder_directory: str) -> None:
-    """Saves the given GameTree as a txt file
+    """Saves the given GameTree in the binary format of tree_file
     Note: If the file name already exists, it will overwrite the file
     """
-    with open(folder_directory + file_name, 'wb') as file:
-        pickle.dump(tree, file)
+    write_tree(tree, folder_directory + file_name)
 
 
-def load_tree_from_file(file_name: str, folder_directory: str) -> GameTree:
-    """Load the tree from the txt file
-    Returns the tree as a GameTree object
+def load_tree_from_file(file_name: str, folder_directory: str, lazy: bool = True) -> GameTree | MappedGameTree:
+    """Load the tree from the file
+    Returns the tree as a read-only MappedGameTree that is decoded from the file as it is used if lazy is True,
+    and as a GameTree object which can be modified otherwise.
+
+    Trees pickled by older versions of save_tree_to_file, such as the pre-generated trees of the README, are still
+    loaded (always as a GameTree, see GameTree.__setstate__). Saving such a tree again with save_tree_to_file
+    converts it to the binary format.
     """
-    with open(folder_directory + file_name, 'rb') as file:
-        return pickle.load(file)
+    path = folder_directory + file_name
+    if not is_tree_file(path):
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    elif lazy:
+        return open_tree(path)
+    else:
+        return read_tree(path)
 
 
 def average_length_of_game_in_folder(folder_directory: str) -> float:
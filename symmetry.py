@@ -0,0 +1,152 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains functions for using the 8 symmetries of a Go board (4 rotations, and
+the same 4 rotations after a reflection) to map move sequences onto a single canonical
+orientation, so that all 8 orientations of a game can be stored as one sequence in a GameTree.
+
+A symmetry is an integer from 0 to 7. Symmetry k < 4 rotates the board k times by 90 degrees,
+and symmetry k >= 4 first reflects the board along its main diagonal and then rotates it
+k - 4 times. Symmetry 0 leaves the board unchanged.
+
+The canonical orientation of a move sequence is the orientation in which the sequence is
+lexicographically smallest. Since a smallest sequence also has the smallest prefixes, the
+canonical form of a game so far is always a prefix of the canonical form of the full game.
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+from typing import Collection
+from game import Game, WHITE_TO_MOVE_KEY
+from board import zobrist_keys, zobrist_key
+
+SYMMETRIES = range(8)
+# the symmetry undoing each symmetry: rotations are undone by rotating back, and reflections undo themselves
+INVERSE_SYMMETRIES = (0, 3, 2, 1, 4, 5, 6, 7)
+
+
+def transform_point(x: int, y: int, symmetry: int, board_size: int = 9) -> tuple[int, int]:
+    """Return the coordinates of the given point after applying the given symmetry
+
+    Passes, represented by (-1, -1), are left unchanged.
+
+    >>> transform_point(0, 0, 1)
+    (0, 8)
+    >>> transform_point(2, 3, 4)
+    (3, 2)
+
+    Preconditions:
+        - symmetry in SYMMETRIES
+        - (x, y) == (-1, -1) or (0 <= x < board_size and 0 <= y < board_size)
+    """
+    if (x, y) == (-1, -1):
+        return x, y
+    if symmetry >= 4:
+        x, y = y, x
+    for _ in range(symmetry % 4):
+        x, y = y, board_size - 1 - x
+    return x, y
+
+
+def transform_move(move: tuple[int, int, int], symmetry: int, board_size: int = 9) -> tuple[int, int, int]:
+    """Return the given (move number, x, y) move after applying the given symmetry
+
+    Preconditions:
+        - symmetry in SYMMETRIES
+    """
+    x, y = transform_point(move[1], move[2], symmetry, board_size)
+    return move[0], x, y
+
+
+def transform_sequence(moves: list[tuple[int, int, int]], symmetry: int,
+                       board_size: int = 9) -> list[tuple[int, int, int]]:
+    """Return the given move sequence after applying the given symmetry to every move
+
+    >>> transform_sequence([(1, 2, 3), (2, -1, -1)], 2)
+    [(1, 6, 5), (2, -1, -1)]
+
+    Preconditions:
+        - symmetry in SYMMETRIES
+    """
+    return [transform_move(move, symmetry, board_size) for move in moves]
+
+
+def canonical_symmetries(moves: list[tuple[int, int, int]], board_size: int = 9,
+                         setup_stones: Collection[tuple[str, int, int]] = ()) -> list[int]:
+    """Return every symmetry which maps the given move sequence to its canonical orientation
+
+    All the returned symmetries map the sequence to the same canonical sequence. There is more
+    than one of them whenever the position is itself symmetric, e.g. for an empty sequence.
+
+    If the game started with the given (colour, x, y) setup stones, only the symmetries which leave
+    them unchanged are considered, so that every canonical sequence starts from the same position.
+
+    >>> canonical_symmetries([(1, 4, 4)])
+    [0, 1, 2, 3, 4, 5, 6, 7]
+    >>> canonical_symmetries([(1, 8, 8), (2, 0, 8)])
+    [6]
+    >>> canonical_symmetries([], 9, [('Black', 2, 6), ('Black', 6, 2)])
+    [0, 2, 4, 6]
+    """
+    candidates = list(SYMMETRIES)
+    if setup_stones:
+        stones = sorted(setup_stones)
+        candidates = [symmetry for symmetry in candidates
+                      if sorted((color,) + transform_point(x, y, symmetry, board_size)
+                                for color, x, y in stones) == stones]
+    for move in moves:
+        if len(candidates) == 1:
+            break
+        transformed = [transform_point(move[1], move[2], symmetry, board_size) for symmetry in candidates]
+        smallest = min(transformed)
+        candidates = [candidates[i] for i in range(len(candidates)) if transformed[i] == smallest]
+    return candidates
+
+
+def canonicalise_sequence(moves: list[tuple[int, int, int]], board_size: int = 9,
+                          setup_stones: Collection[tuple[str, int, int]] = ()
+                          ) -> tuple[list[tuple[int, int, int]], int]:
+    """Return the canonical form of the given move sequence (played after the given setup stones),
+    and the symmetry which produced it
+
+    >>> canonicalise_sequence([(1, 8, 8), (2, 0, 8)])
+    ([(1, 0, 0), (2, 0, 8)], 6)
+    """
+    symmetry = canonical_symmetries(moves, board_size, setup_stones)[0]
+    return transform_sequence(moves, symmetry, board_size), symmetry
+
+
+def transformed_position_key(game: Game, symmetry: int) -> int:
+    """Return the Game.position_key() that the current position of the given game would have
+    after applying the given symmetry to the board
+
+    Preconditions:
+        - symmetry in SYMMETRIES
+    """
+    size = game.board.size
+    keys = zobrist_keys(size)
+    position_key = WHITE_TO_MOVE_KEY if game.current_player == "White" else 0
+    for x in range(size):
+        for y in range(size):
+            color = game.board.get_color(x, y)
+            if color != "Neither":
+                new_x, new_y = transform_point(x, y, symmetry, size)
+                position_key ^= zobrist_key(keys, new_x * size + new_y, color)
+    return position_key
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
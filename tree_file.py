@@ -0,0 +1,320 @@
+"""Beta-Go-Zero: AI for playing Go built with python
+
+Author:
+Henry "TJ" Chen
+
+Original project by:
+Henry "TJ" Chen, Dmitrii Vlasov, Ming Yau (Oscar) Lam, Duain Chhabra
+
+Version: 1.3
+
+Module Description
+==================
+
+This module contains a versioned binary file format for saving a GameTree, and a read-only
+view of a saved tree which is opened with mmap, so that a node is only decoded from the file
+once it is visited. Opening a tree is therefore near-instant no matter how large it is, and
+several processes opening the same file share its pages in memory.
+
+File layout (all values little-endian):
+    - header: magic b'BGZT', version, flags, board size, handicap, number of setup stones, node count and edge count
+    - setup stones: only for TranspositionGameTree, a (colour, x, y) record per setup stone of its games
+    - nodes: one fixed-size record per node, with the root first (see NODE_RECORD)
+    - edges: the index of the child node of every edge, grouped by parent node
+    - position index: only for TranspositionGameTree, a (position key, node index) record
+      per node, sorted by position key
+
+See README file for instructions, project details, and the relevant copyright and usage information
+"""
+
+from __future__ import annotations
+import mmap
+import struct
+import weakref
+from typing import Optional
+from gametree import GameTree, TranspositionGameTree, encode_move, decode_move
+
+MAGIC = b'BGZT'
+VERSION = 2
+FLAG_TRANSPOSITIONS = 1
+
+# magic, version, flags, board size, handicap, number of setup stones, node count, edge count
+HEADER = struct.Struct('<4sHHHHHII')
+# version 1 files have no handicap or setup stones:
+# magic, version, flags, board size, (reserved), node count, edge count
+HEADER_V1 = struct.Struct('<4sHHHHII')
+# colour (1 for black, 2 for white), x, y
+SETUP_RECORD = struct.Struct('<BBB')
+# move code, visits, value sum, position key, index of the first edge, number of edges
+NODE_RECORD = struct.Struct('<IIdQII')
+# the move code alone, which is the first field of a node record
+MOVE_FIELD = struct.Struct('<I')
+EDGE_RECORD = struct.Struct('<I')
+# position key, node index
+INDEX_RECORD = struct.Struct('<QI')
+
+
+def is_tree_file(path: str) -> bool:
+    """Return whether the file at the given path is a tree saved in this binary format"""
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_tree(tree: GameTree, path: str) -> None:
+    """Save the given tree to the given path in the binary format of this module
+
+    Nodes are numbered in breadth-first order, and a node shared by several parents
+    (in a TranspositionGameTree) is only written once.
+    Note: If the file already exists, it will overwrite the file
+    """
+    is_transposition = isinstance(tree, TranspositionGameTree)
+    nodes = [tree]
+    indices = {id(tree): 0}
+    edges = []
+    node_edges = []
+    i = 0
+    while i < len(nodes):
+        subtrees = nodes[i].get_subtrees()
+        node_edges.append((len(edges), len(subtrees)))
+        for subtree in subtrees:
+            if id(subtree) not in indices:
+                indices[id(subtree)] = len(nodes)
+                nodes.append(subtree)
+            edges.append(indices[id(subtree)])
+        i += 1
+
+    flags = FLAG_TRANSPOSITIONS if is_transposition else 0
+    board_size, handicap, setup_stones = tree.setup if is_transposition else (0, 0, ())
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, board_size, handicap, len(setup_stones),
+                               len(nodes), len(edges)))
+        for color, x, y in setup_stones:
+            file.write(SETUP_RECORD.pack(1 if color == "Black" else 2, x, y))
+        for node, (first_edge, edge_count) in zip(nodes, node_edges):
+            position_key = node.position_key if is_transposition else 0
+            # nodes of the old GameTree module (tree_saves/treeSave.txt) have no visit counts, only a win probability
+            visits = getattr(node, 'visits', 0)
+            value_sum = node.value_sum if visits else node.win_probability
+            file.write(NODE_RECORD.pack(encode_move(node.move), visits, value_sum, position_key,
+                                        first_edge, edge_count))
+        file.write(struct.pack(f'<{len(edges)}I', *edges))
+        if is_transposition:
+            for position_key, index in sorted((node.position_key, indices[id(node)]) for node in nodes):
+                file.write(INDEX_RECORD.pack(position_key, index))
+
+
+def open_tree(path: str) -> MappedGameTree:
+    """Open the tree saved at the given path without decoding any of it, and return its root"""
+    return MappedGameTree(_TreeFile(path), 0)
+
+
+def read_tree(path: str) -> GameTree:
+    """Decode the whole tree saved at the given path into GameTree (or TranspositionGameTree) objects,
+    which can then be modified"""
+    tree_file = _TreeFile(path)
+    trees = []
+    table = {}
+    for index in range(tree_file.node_count):
+        move_code, visits, value_sum, position_key, _, _ = tree_file.node(index)
+        if tree_file.is_transposition:
+            node = TranspositionGameTree(decode_move(move_code), 0.0, position_key, tree_file.board_size, table,
+                                         tree_file.handicap, tree_file.setup_stones)
+        else:
+            node = GameTree(decode_move(move_code))
+        node.visits, node.value_sum = visits, value_sum
+        trees.append(node)
+    for index, node in enumerate(trees):
+        for child in tree_file.children(index):
+            node.add_subtree(trees[child])
+    tree_file.close()
+    return trees[0]
+
+
+class _TreeFile:
+    """An open tree file, shared by every MappedGameTree node read from it
+
+    Instance Attributes:
+        - path: the path of the file
+        - board_size: the size of the board of a TranspositionGameTree, or 0
+        - handicap: the handicap of the games of a TranspositionGameTree
+        - setup_stones: the (colour, x, y) setup stones of the games of a TranspositionGameTree
+        - is_transposition: whether the file contains a TranspositionGameTree
+        - node_count: the number of nodes in the file
+    """
+    path: str
+    board_size: int
+    handicap: int
+    setup_stones: list[tuple[str, int, int]]
+    is_transposition: bool
+    node_count: int
+
+    def __init__(self, path: str) -> None:
+        """Open and map the file at the given path
+
+        Raises ValueError if the file is not in a supported version of the format.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._buffer, 0)[:2]
+        if magic != MAGIC or version not in {1, VERSION}:
+            raise ValueError(f'{path} is not a version 1 or {VERSION} tree file')
+        elif version == 1:
+            _, _, flags, self.board_size, _, self.node_count, edge_count = HEADER_V1.unpack_from(self._buffer, 0)
+            self.handicap, setup_count, offset = 0, 0, HEADER_V1.size
+        else:
+            _, _, flags, self.board_size, self.handicap, setup_count, self.node_count, edge_count = \
+                HEADER.unpack_from(self._buffer, 0)
+            offset = HEADER.size
+        self.is_transposition = bool(flags & FLAG_TRANSPOSITIONS)
+        self.setup_stones = []
+        for _ in range(setup_count):
+            color, x, y = SETUP_RECORD.unpack_from(self._buffer, offset)
+            self.setup_stones.append(("Black" if color == 1 else "White", x, y))
+            offset += SETUP_RECORD.size
+        self._nodes_offset = offset
+        self._edges_offset = self._nodes_offset + self.node_count * NODE_RECORD.size
+        self._index_offset = self._edges_offset + edge_count * EDGE_RECORD.size
+
+    def node(self, index: int) -> tuple[int, int, float, int, int, int]:
+        """Return the decoded record of the node with the given index"""
+        return NODE_RECORD.unpack_from(self._buffer, self._nodes_offset + index * NODE_RECORD.size)
+
+    def move_code(self, index: int) -> int:
+        """Return the packed move of the node with the given index"""
+        return MOVE_FIELD.unpack_from(self._buffer, self._nodes_offset + index * NODE_RECORD.size)[0]
+
+    def children(self, index: int) -> tuple[int, ...]:
+        """Return the indices of the children of the node with the given index"""
+        first_edge, edge_count = self.node(index)[4:]
+        return struct.unpack_from(f'<{edge_count}I', self._buffer, self._edges_offset + first_edge * EDGE_RECORD.size)
+
+    def find_position(self, position_key: int) -> Optional[int]:
+        """Return the index of the node with the given position key, using a binary search of the position
+        index. Return None if there is no such node, or if the file has no position index."""
+        if not self.is_transposition:
+            return None
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            key, index = INDEX_RECORD.unpack_from(self._buffer, self._index_offset + middle * INDEX_RECORD.size)
+            if key == position_key:
+                return index
+            elif key < position_key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self) -> None:
+        """Unmap the file"""
+        self._buffer.close()
+
+
+# the tree files opened by _open_node, by path, so that the nodes unpickled from the same file share one mapping
+# for as long as any of them is in use
+_OPENED_FILES: weakref.WeakValueDictionary[str, _TreeFile] = weakref.WeakValueDictionary()
+
+
+def _open_node(path: str, index: int) -> MappedGameTree:
+    """Reopen the node with the given index of the tree file at the given path (used for pickling)"""
+    tree_file = _OPENED_FILES.get(path)
+    if tree_file is None:
+        tree_file = _TreeFile(path)
+        _OPENED_FILES[path] = tree_file
+    return MappedGameTree(tree_file, index)
+
+
+class MappedGameTree:
+    """A read-only node of a tree saved with write_tree, decoded from the file only when it is used
+
+    It offers the same methods for reading the tree as GameTree, and find_subtree_by_position if the
+    file contains a TranspositionGameTree. Pickling a node only pickles the path of its file, so that
+    other processes map the same file instead of copying the tree.
+
+    Instance Attributes:
+        - _file: the open file containing this node
+        - _index: the index of this node in the file
+    """
+    __slots__ = ('_file', '_index')
+    _file: _TreeFile
+    _index: int
+
+    def __init__(self, tree_file: _TreeFile, index: int) -> None:
+        """Initialize a view of the node with the given index of the given file"""
+        self._file = tree_file
+        self._index = index
+
+    @property
+    def move(self) -> tuple[int, int, int]:
+        """The move represented by this node"""
+        return decode_move(self._file.move_code(self._index))
+
+    @property
+    def visits(self) -> int:
+        """The number of sequences which passed through this node"""
+        return self._file.node(self._index)[1]
+
+    @property
+    def value_sum(self) -> float:
+        """The sum of the probabilities of the sequences which passed through this node"""
+        return self._file.node(self._index)[2]
+
+    @property
+    def win_probability(self) -> float:
+        """The average probability of the sequences through this node"""
+        visits, value_sum = self._file.node(self._index)[1:3]
+        if visits == 0:
+            return value_sum
+        return value_sum / visits
+
+    @property
+    def position_key(self) -> int:
+        """The position key of this node, or 0 if the tree is not a TranspositionGameTree"""
+        return self._file.node(self._index)[3]
+
+    def get_subtrees(self) -> list[MappedGameTree]:
+        """Return the subtrees of this game tree."""
+        return [MappedGameTree(self._file, child) for child in self._file.children(self._index)]
+
+    def find_subtree_by_move(self, move: tuple[int, int, int]) -> Optional[MappedGameTree]:
+        """Return the subtree corresponding to the given move.
+
+        As in TranspositionGameTree, only the coordinates of the move are compared for a transposition tree.
+        Return None if no subtree corresponds to that move.
+        """
+        mask = 0xFFFF if self._file.is_transposition else 0xFFFFFFFF
+        move_code = encode_move(move) & mask
+        for child in self._file.children(self._index):
+            if self._file.move_code(child) & mask == move_code:
+                return MappedGameTree(self._file, child)
+        return None
+
+    def find_subtree_by_position(self, position_key: int) -> Optional[MappedGameTree]:
+        """Return the node of this tree representing the position with the given key.
+
+        Return None if the position does not appear in this tree, or if it is not a transposition tree.
+        """
+        index = self._file.find_position(position_key)
+        if index is None:
+            return None
+        return MappedGameTree(self._file, index)
+
+    def is_black_turn(self) -> bool:
+        """Return whether the CURRENT move should was made by black."""
+        move_number = self.move[0]
+        return move_number > 0 and move_number % 2 == 1
+
+    def __len__(self) -> int:
+        """Return the number of nodes in the file containing this tree."""
+        return self._file.node_count
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether the two views are of the same node of the same file"""
+        return isinstance(other, MappedGameTree) and self._file is other._file and self._index == other._index
+
+    def __hash__(self) -> int:
+        return hash((id(self._file), self._index))
+
+    def __reduce__(self) -> tuple:
+        return _open_node, (self._file.path, self._index)